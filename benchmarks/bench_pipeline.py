@@ -0,0 +1,194 @@
+"""Benchmark the collection and prompt pipeline on a synthetic repository.
+
+Usage:
+    python benchmarks/bench_pipeline.py --scenario medium
+    python benchmarks/bench_pipeline.py --commits 5000 --huge-commits 3 --output results.json
+    python benchmarks/bench_pipeline.py --commits 5000 --token-budget 200000 --tokenizer-threads 8
+
+The prompt is generated once with --tokenizer-threads and once on a single thread, to measure the
+speedup of counting tokens in parallel; both must produce the same prompt. These token stages are
+skipped if the tiktoken encoding cannot be loaded, e.g. offline without a cached copy.
+"""
+
+import argparse
+import dataclasses
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from harness import make_config, measure, print_stages, write_results  # noqa: E402
+from synthetic_repo import BENCH_AUTHOR, RepoSpec, build_repo  # noqa: E402
+
+from commit_cache import CommitCache  # noqa: E402
+from git_data_collector import GitDataCollector  # noqa: E402
+from main import summarize_commit_data  # noqa: E402
+from prompt_generator import PromptGenerator  # noqa: E402
+from token_counter import get_encoding  # noqa: E402
+
+SCENARIOS = {
+    "small": RepoSpec(commits=200, files=50, diff_lines=20),
+    "medium": RepoSpec(commits=2000, files=200, diff_lines=40, huge_commits=2),
+    "large": RepoSpec(
+        commits=10000, files=1000, diff_lines=60, huge_commits=5, huge_diff_lines=200000
+    ),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="small")
+    parser.add_argument("--commits", type=int, help="Number of commits")
+    parser.add_argument("--files", type=int, help="Number of files the commits touch")
+    parser.add_argument("--files-per-commit", type=int)
+    parser.add_argument("--diff-lines", type=int, help="Lines rewritten per touched file")
+    parser.add_argument("--huge-commits", type=int, help="Number of huge-diff commits")
+    parser.add_argument("--huge-diff-lines", type=int, help="Lines added by each huge-diff commit")
+    parser.add_argument("--collection-mode", choices=["batch", "per_commit"], default="batch")
+    parser.add_argument("--max-diff-lines", type=int, default=200)
+    parser.add_argument("--token-budget", type=int, help="Generate the prompt with this token budget")
+    parser.add_argument(
+        "--tokenizer-threads", type=int, default=8, help="Threads counting tokens in generate_prompt"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage")
+    parser.add_argument("--repo-dir", help="Build the repository here instead of a temporary directory")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/pipeline-<time>.json)")
+    return parser.parse_args()
+
+
+def measure_prompt(repo_path, commits, summary, config, serial_config, args, counts):
+    """Time generating the prompt on --tokenizer-threads and on one thread, and counting its tokens."""
+    stages = []
+    project_data = [
+        {
+            "project_name": "synthetic",
+            "repo_path": repo_path,
+            "recent_commits": commits,
+            "summary": summary,
+        }
+    ]
+    prompt_gen = PromptGenerator(project_data=project_data, config_loader=config)
+    prompt_stage, prompt = measure(
+        "generate_prompt",
+        lambda: prompt_gen.generate_prompt(token_budget=args.token_budget),
+        args.repeat,
+    )
+    stages.append(prompt_stage)
+
+    serial_prompt_gen = PromptGenerator(project_data=project_data, config_loader=serial_config)
+    serial_stage, serial_prompt = measure(
+        "generate_prompt_serial",
+        lambda: serial_prompt_gen.generate_prompt(token_budget=args.token_budget),
+        args.repeat,
+    )
+    stages.append(serial_stage)
+    if serial_prompt != prompt:
+        raise RuntimeError("Counting tokens on several threads changed the prompt")
+
+    stage, tokens = measure(
+        "count_approximate_tokens",
+        lambda: prompt_gen.count_approximate_tokens(prompt),
+        args.repeat,
+    )
+    stages.append(stage)
+
+    counts["prompt_chars"] = len(prompt)
+    counts["prompt_tokens"] = tokens
+    counts["tokenizer_speedup"] = min(serial_stage.seconds) / min(prompt_stage.seconds)
+    return stages
+
+
+def main():
+    args = parse_args()
+    overrides = {
+        field.name: getattr(args, field.name)
+        for field in dataclasses.fields(RepoSpec)
+        if getattr(args, field.name, None) is not None
+    }
+    spec = dataclasses.replace(SCENARIOS[args.scenario], **overrides)
+
+    with tempfile.TemporaryDirectory(prefix="weekly-report-bench-") as work_dir:
+        repo_path = args.repo_dir or os.path.join(work_dir, "repo")
+        start = time.perf_counter()
+        build_repo(repo_path, spec)
+        build_seconds = time.perf_counter() - start
+        print(f"Built {spec.commits} commits in {build_seconds:.1f} s at {repo_path}")
+
+        config = make_config(
+            work_dir,
+            [repo_path],
+            author=BENCH_AUTHOR,
+            collection_mode=args.collection_mode,
+            max_diff_lines=args.max_diff_lines,
+            tokenizer_threads=args.tokenizer_threads,
+        )
+        serial_dir = os.path.join(work_dir, "serial")
+        os.makedirs(serial_dir)
+        serial_config = make_config(
+            serial_dir,
+            [repo_path],
+            author=BENCH_AUTHOR,
+            collection_mode=args.collection_mode,
+            max_diff_lines=args.max_diff_lines,
+            tokenizer_threads=1,
+        )
+        since_date = datetime.now() - timedelta(days=1)
+        stages = []
+
+        def collect(commit_cache=None):
+            collector = GitDataCollector(
+                config_loader=config, repo_path=repo_path, commit_cache=commit_cache
+            )
+            return collector.collect_commits(since_date=since_date)
+
+        stage, commits = measure("collect_commits", collect, args.repeat)
+        stages.append(stage)
+
+        commit_cache = CommitCache(
+            os.path.join(work_dir, "cache", "commits.sqlite3"), max_size_bytes=1024 ** 3
+        )
+        # Fill the cache, so the stage measures warm runs
+        collect(commit_cache)
+        stage, _ = measure(
+            "collect_commits_cached", lambda: collect(commit_cache), args.repeat
+        )
+        stages.append(stage)
+        commit_cache.close()
+
+        stage, summary = measure(
+            "summarize_commit_data", lambda: summarize_commit_data(commits), args.repeat
+        )
+        stages.append(stage)
+
+        counts = {"repo_build_seconds": build_seconds, "collected_commits": len(commits)}
+        try:
+            get_encoding()
+        except Exception as e:
+            print(f"Skipping the token stages, the tiktoken encoding could not be loaded: {e}")
+        else:
+            stages += measure_prompt(repo_path, commits, summary, config, serial_config, args, counts)
+
+    print_stages(stages)
+    output = write_results(
+        "pipeline",
+        params={
+            "scenario": args.scenario,
+            "repo": dataclasses.asdict(spec),
+            "collection_mode": args.collection_mode,
+            "max_diff_lines": args.max_diff_lines,
+            "token_budget": args.token_budget,
+            "tokenizer_threads": args.tokenizer_threads,
+            "repeat": args.repeat,
+        },
+        stages=stages,
+        counts=counts,
+        output=args.output,
+    )
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
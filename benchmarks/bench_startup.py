@@ -0,0 +1,131 @@
+"""Benchmark the startup time of the CLI and check it against a target.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 20 --max-import-ms 100
+
+Each run starts a fresh interpreter. The script exits with status 1 if the median time to import
+main.py exceeds --max-import-ms, or if it loads GitPython, pydantic or tiktoken. The tokenizer stage is skipped if its BPE data cannot be loaded.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from harness import PACKAGE_DIR, StageResult, print_stages, write_results  # noqa: E402
+
+# Importing main.py must not load GitPython, pydantic or tiktoken
+DEFAULT_MAX_IMPORT_MS = 150
+
+# Run in a fresh interpreter; prints the seconds spent in the timed statement
+TIMED_SNIPPET = """
+import sys, time
+sys.path.insert(0, {package_dir!r})
+{setup}
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start)
+"""
+
+HEAVY_MODULES = ["git", "pydantic", "tiktoken"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10, help="Fresh interpreters per stage")
+    parser.add_argument(
+        "--max-import-ms",
+        type=float,
+        default=DEFAULT_MAX_IMPORT_MS,
+        help="Fail if the median import time of main.py exceeds this",
+    )
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/startup-<time>.json)")
+    return parser.parse_args()
+
+
+def time_snippet(name, statement, repeat, setup=""):
+    """Time a statement in `repeat` fresh interpreters, measured inside the interpreter."""
+    result = StageResult(name)
+    code = TIMED_SNIPPET.format(package_dir=PACKAGE_DIR, setup=setup, statement=statement)
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=PACKAGE_DIR
+        ).stdout
+        result.seconds.append(float(output.strip().splitlines()[-1]))
+    return result
+
+
+def time_command(name, args, repeat):
+    """Time a command in `repeat` fresh interpreters, including the interpreter's own startup."""
+    result = StageResult(name)
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *args], capture_output=True, check=True, cwd=PACKAGE_DIR
+        )
+        result.seconds.append(time.perf_counter() - start)
+    return result
+
+
+def find_heavy_imports():
+    """Return the heavy modules loaded by importing main.py."""
+    code = TIMED_SNIPPET.format(
+        package_dir=PACKAGE_DIR,
+        setup="",
+        statement=f"import main; print(','.join(sorted(set({HEAVY_MODULES!r}) & set(sys.modules))))",
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=PACKAGE_DIR
+    ).stdout
+    return [name for name in output.splitlines()[0].split(",") if name]
+
+
+def main():
+    args = parse_args()
+    stages = [
+        time_snippet("import_main", "import main", args.repeat),
+        time_command("cli_help", ["main.py", "--help"], args.repeat),
+    ]
+    try:
+        stages.append(
+            time_snippet(
+                "load_tokenizer",
+                "token_counter.get_encoding()",
+                args.repeat,
+                setup="import token_counter",
+            )
+        )
+    except subprocess.CalledProcessError as e:
+        error = e.stderr.strip().splitlines()[-1] if e.stderr.strip() else e
+        print(f"Skipping load_tokenizer, the tiktoken encoding could not be loaded: {error}")
+    heavy_imports = find_heavy_imports()
+
+    print_stages(stages)
+    import_ms = statistics.median(stages[0].seconds) * 1000
+    passed = import_ms <= args.max_import_ms and not heavy_imports
+    output = write_results(
+        "startup",
+        params={"repeat": args.repeat, "max_import_ms": args.max_import_ms},
+        stages=stages,
+        counts={
+            "import_main_median_ms": import_ms,
+            "heavy_imports": heavy_imports,
+            "target_met": passed,
+        },
+        output=args.output,
+    )
+    print(f"Results written to {output}")
+    print(f"Importing main.py took {import_ms:.1f} ms (target: {args.max_import_ms:.0f} ms)")
+    if heavy_imports:
+        print(f"Importing main.py loaded {', '.join(heavy_imports)}")
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Timing, memory and result helpers shared by the benchmarks."""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+PACKAGE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "weekly_report_prompt"
+)
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# The package modules import each other by their flat names, as when main.py is run directly
+if PACKAGE_DIR not in sys.path:
+    sys.path.insert(0, PACKAGE_DIR)
+
+
+class StageResult:
+    """Timings and peak memory of one benchmarked stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds: List[float] = []
+        self.peak_memory_bytes = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "seconds": self.seconds,
+            "min_seconds": min(self.seconds),
+            "median_seconds": statistics.median(self.seconds),
+            "peak_memory_bytes": self.peak_memory_bytes,
+        }
+
+
+def measure(name: str, func: Callable[[], Any], repeat: int = 3) -> Tuple[StageResult, Any]:
+    """Time `func` `repeat` times, then run it once more under tracemalloc for its peak memory.
+
+    The memory run is separate because tracing allocations slows the code down considerably.
+    Returns the stage result and the value returned by the last timed call.
+    """
+    result = StageResult(name)
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        result.seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        result.peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, value
+
+
+def make_config(work_dir: str, repositories: List[str], **settings):
+    """Write a config.yaml and template.md into `work_dir` and return a ConfigLoader for them."""
+    from config_loader import ConfigLoader
+
+    config = {"repository": repositories, "lang": "english"}
+    config.update(settings)
+    config_path = os.path.join(work_dir, "config.yaml")
+    template_path = os.path.join(work_dir, "template.md")
+    with open(config_path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f)
+    with open(template_path, "w", encoding="utf-8") as f:
+        f.write("# Weekly Report\n\n## Done\n\n## Next\n")
+    return ConfigLoader(config_path=config_path, template_path=template_path)
+
+
+def write_results(
+    benchmark: str,
+    params: Dict[str, Any],
+    stages: List[StageResult],
+    counts: Dict[str, Any],
+    output: Optional[str] = None,
+) -> str:
+    """Write the results as JSON to `output`, or to a timestamped file in benchmarks/results."""
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(
+            RESULTS_DIR, f"{benchmark}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+        )
+    results = {
+        "benchmark": benchmark,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "git": subprocess.run(
+                ["git", "--version"], capture_output=True, text=True
+            ).stdout.strip(),
+        },
+        "params": params,
+        "stages": {stage.name: stage.to_dict() for stage in stages},
+        "counts": counts,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    return output
+
+
+def print_stages(stages: List[StageResult]):
+    """Print a short human-readable summary of the stages."""
+    for stage in stages:
+        print(
+            f"{stage.name:<24} min {min(stage.seconds) * 1000:9.1f} ms  "
+            f"median {statistics.median(stage.seconds) * 1000:9.1f} ms  "
+            f"peak {stage.peak_memory_bytes / 1024 / 1024:8.1f} MiB"
+        )
@@ -0,0 +1,96 @@
+"""Build synthetic git repositories for the benchmarks, without touching the network.
+
+Commits are written with `git fast-import`, so even repositories with tens of thousands of
+commits are created in seconds.
+"""
+
+import os
+import random
+import subprocess
+import time
+from dataclasses import dataclass
+from typing import List
+
+BENCH_AUTHOR = "Bench Author"
+BENCH_EMAIL = "bench@example.com"
+# Commits by other authors, which the collector has to filter out
+OTHER_AUTHORS = [
+    ("Other Dev", "other@example.com"),
+    ("Third Dev", "third@example.com"),
+]
+
+
+@dataclass
+class RepoSpec:
+    commits: int = 200
+    files: int = 50
+    # Files touched by each commit
+    files_per_commit: int = 3
+    # Lines rewritten in each touched file
+    diff_lines: int = 20
+    # Commits adding a single file of `huge_diff_lines` lines
+    huge_commits: int = 0
+    huge_diff_lines: int = 50000
+    # Share of the commits written by BENCH_AUTHOR
+    author_ratio: float = 0.7
+    seed: int = 0
+
+
+def build_repo(path: str, spec: RepoSpec) -> str:
+    """Create a repository at `path` following `spec` and return its path."""
+    os.makedirs(path, exist_ok=True)
+    subprocess.run(["git", "init", "-q", "-b", "main", path], check=True)
+    rng = random.Random(spec.seed)
+    # Commits are spread over the last few hours, so every one falls into the collection window
+    start = int(time.time()) - spec.commits - 3600
+    huge_at = set(
+        rng.sample(range(spec.commits), min(spec.huge_commits, spec.commits))
+    )
+
+    process = subprocess.Popen(
+        ["git", "fast-import", "--quiet"], cwd=path, stdin=subprocess.PIPE
+    )
+    try:
+        for index in range(spec.commits):
+            if rng.random() < spec.author_ratio:
+                name, email = BENCH_AUTHOR, BENCH_EMAIL
+            else:
+                name, email = rng.choice(OTHER_AUTHORS)
+            timestamp = start + index
+            message = f"Change {index}: update {spec.files_per_commit} files\n\nSynthetic commit {index}.\n"
+
+            chunks: List[bytes] = [
+                b"commit refs/heads/main\n",
+                f"author {name} <{email}> {timestamp} +0000\n".encode(),
+                f"committer {name} <{email}> {timestamp} +0000\n".encode(),
+                _data(message.encode()),
+            ]
+            if index in huge_at:
+                content = "".join(
+                    f"generated line {line} of commit {index}\n"
+                    for line in range(spec.huge_diff_lines)
+                )
+                chunks.append(f"M 100644 inline huge/commit-{index}.txt\n".encode())
+                chunks.append(_data(content.encode()))
+            else:
+                for file_index in rng.sample(
+                    range(spec.files), min(spec.files_per_commit, spec.files)
+                ):
+                    content = "".join(
+                        f"def function_{line}():  # file {file_index}, revision {index}\n"
+                        for line in range(spec.diff_lines)
+                    )
+                    chunks.append(
+                        f"M 100644 inline src/module_{file_index}.py\n".encode()
+                    )
+                    chunks.append(_data(content.encode()))
+            process.stdin.write(b"".join(chunks) + b"\n")
+        process.stdin.close()
+    finally:
+        if process.wait() != 0:
+            raise RuntimeError(f"git fast-import failed for {path}")
+    return path
+
+
+def _data(content: bytes) -> bytes:
+    return f"data {len(content)}\n".encode() + content + b"\n"
@@ -0,0 +1,134 @@
+import itertools
+import os
+import subprocess
+import sys
+from typing import Dict, Optional
+
+import pytest
+import yaml
+
+PACKAGE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "weekly_report_prompt"
+)
+
+# The package modules import each other by their flat names, as when main.py is run directly
+if PACKAGE_DIR not in sys.path:
+    sys.path.insert(0, PACKAGE_DIR)
+
+AUTHOR = ("Alice Kim", "alice@example.com")
+GIT_ENV = {
+    "GIT_CONFIG_NOSYSTEM": "1",
+    "GIT_CONFIG_GLOBAL": os.devnull,
+    "GIT_COMMITTER_NAME": "Committer",
+    "GIT_COMMITTER_EMAIL": "committer@example.com",
+}
+
+
+class GitRepo:
+    """A throwaway local repository, written to with the git command line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._time = 1_700_000_000
+        self.git("init", "-q", "-b", "main")
+
+    def git(self, *args: str, env: Optional[Dict[str, str]] = None) -> str:
+        return subprocess.run(
+            ["git", *args],
+            cwd=self.path,
+            env={**os.environ, **(env or {})},
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+
+    def commit(self, message: str, files: Dict[str, Optional[str]], author=AUTHOR) -> str:
+        """Write (or delete, for None) the files and commit them; return the new commit's SHA."""
+        for name, content in files.items():
+            path = os.path.join(self.path, name)
+            if content is None:
+                os.remove(path)
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+        self.git("add", "-A")
+        # Commits one minute apart, so they are ordered the same way on every run
+        self._time += 60
+        date = f"{self._time} +0000"
+        self.git(
+            "commit",
+            "-q",
+            "-m",
+            message,
+            env={
+                "GIT_AUTHOR_NAME": author[0],
+                "GIT_AUTHOR_EMAIL": author[1],
+                "GIT_AUTHOR_DATE": date,
+                "GIT_COMMITTER_DATE": date,
+            },
+        )
+        return self.git("rev-parse", "HEAD")
+
+
+@pytest.fixture(autouse=True)
+def git_env(monkeypatch):
+    """Keep the user's git configuration out of the repositories the tests read, with GitPython too."""
+    for name, value in GIT_ENV.items():
+        monkeypatch.setenv(name, value)
+
+
+@pytest.fixture
+def git_repo(tmp_path) -> GitRepo:
+    path = tmp_path / "repo"
+    path.mkdir()
+    return GitRepo(str(path))
+
+
+@pytest.fixture
+def make_config(tmp_path):
+    """Return a function writing a config.yaml and template.md and returning a ConfigLoader for them."""
+    from config_loader import ConfigLoader
+
+    def make_config(**settings) -> ConfigLoader:
+        config = {"author": AUTHOR[0], "lang": "english", "repository": []}
+        config.update(settings)
+        config_path = tmp_path / "config.yaml"
+        template_path = tmp_path / "template.md"
+        config_path.write_text(yaml.safe_dump(config), encoding="utf-8")
+        template_path.write_text("# Weekly Report\n\n## Done\n\n## Next\n", encoding="utf-8")
+        return ConfigLoader(config_path=str(config_path), template_path=str(template_path))
+
+    return make_config
+
+
+@pytest.fixture
+def build_dir(tmp_path, monkeypatch) -> str:
+    """Write reports, prompts and state to a temporary build directory instead of the package's."""
+    import report_file_manager
+    import team
+
+    path = str(tmp_path / "build")
+    monkeypatch.setattr(report_file_manager, "DEFAULT_BUILD_DIR", path)
+    monkeypatch.setattr(team, "DEFAULT_BUILD_DIR", path)
+    return path
+
+
+@pytest.fixture
+def encoding(monkeypatch):
+    """Count tokens with a small BPE built here, since the model's own BPE data needs a download."""
+    import tiktoken
+    import token_counter
+
+    ranks = {bytes([byte]): byte for byte in range(256)}
+    for pair in itertools.product(b"etaoinshrdlu _-+(){}=.,:;\n", repeat=2):
+        ranks.setdefault(bytes(pair), len(ranks))
+    encoding = tiktoken.Encoding(
+        "test",
+        # The pre-tokenizer of cl100k_base, the encoding of DEFAULT_MODEL
+        pat_str=r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]++[\r\n]*|\s*[\r\n]|\s+(?!\S)|\s+""",
+        mergeable_ranks=ranks,
+        special_tokens={},
+    )
+    monkeypatch.setitem(token_counter._encodings, token_counter.DEFAULT_MODEL, encoding)
+    return encoding
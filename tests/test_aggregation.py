@@ -0,0 +1,80 @@
+from datetime import datetime
+
+from aggregation import ROOT_DIRECTORY, merge_activity, summarize_commits
+from schemas import ActivityStats, CommitRecord, StatsRecord
+
+
+def make_commit(date, per_file):
+    insertions = sum(file_insertions for _, file_insertions, _ in per_file)
+    deletions = sum(file_deletions for _, _, file_deletions in per_file)
+    return CommitRecord(
+        id=date.isoformat(),
+        author="Alice Kim",
+        email="alice@example.com",
+        date=date,
+        message="Change",
+        stats=StatsRecord(insertions, deletions, len(per_file), per_file),
+        diff="",
+    )
+
+
+def keys_and_counts(breakdown):
+    return [
+        (stats.key, stats.commits, stats.insertions, stats.deletions, stats.files)
+        for stats in breakdown
+    ]
+
+
+def test_breakdowns_by_day_week_and_directory():
+    commits = [
+        # Friday and Sunday of one week, Monday of the next
+        make_commit(
+            datetime(2024, 5, 10, 9), [("src/app/main.py", 10, 2), ("src/app/util.py", 5, 0)]
+        ),
+        make_commit(datetime(2024, 5, 12, 18), [("docs/index.md", 3, 3), ("setup.py", 1, 0)]),
+        make_commit(datetime(2024, 5, 13, 8), [("src/lib/core.py", 4, 4)]),
+        make_commit(datetime(2024, 5, 13, 17), [("src/app/main.py", 1, 1)]),
+    ]
+
+    summary = summarize_commits(commits)
+
+    assert summary.start_date == datetime(2024, 5, 10, 9)
+    assert summary.end_date == datetime(2024, 5, 13, 17)
+    assert (summary.total_commits, summary.total_insertions, summary.total_deletions) == (4, 24, 10)
+    assert summary.total_files_changed == 6
+    assert keys_and_counts(summary.daily) == [
+        ("2024-05-10", 1, 15, 2, 2),
+        ("2024-05-12", 1, 4, 3, 2),
+        ("2024-05-13", 2, 5, 5, 2),
+    ]
+    assert keys_and_counts(summary.weekly) == [
+        ("2024-05-06", 2, 19, 5, 4),
+        ("2024-05-13", 2, 5, 5, 2),
+    ]
+    # A commit counts once per directory, however many of its files are in it
+    assert keys_and_counts(summary.directories) == [
+        ("src/", 3, 20, 7, 4),
+        ("docs/", 1, 3, 3, 1),
+        (ROOT_DIRECTORY, 1, 1, 0, 1),
+    ]
+
+    summary = summarize_commits(commits, directory_depth=2)
+    assert [stats.key for stats in summary.directories] == [
+        "src/app/",
+        "src/lib/",
+        "docs/",
+        ROOT_DIRECTORY,
+    ]
+
+
+def test_merge_activity_adds_up_repositories():
+    first = [ActivityStats(key="2024-05-06", commits=2, insertions=10, deletions=1, files=3)]
+    second = [
+        ActivityStats(key="2024-05-13", commits=1, insertions=1, deletions=1, files=1),
+        ActivityStats(key="2024-05-06", commits=1, insertions=2, deletions=0, files=1),
+    ]
+
+    assert keys_and_counts(merge_activity([first, second])) == [
+        ("2024-05-06", 3, 12, 1, 4),
+        ("2024-05-13", 1, 1, 1, 1),
+    ]
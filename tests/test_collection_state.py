@@ -0,0 +1,47 @@
+import os
+from datetime import datetime
+
+from collection_state import CollectionState
+from file_modes import UMASK
+from git_data_collector import GitDataCollector
+
+
+def test_watermark_advances_only_for_archived_reports(tmp_path):
+    state_path = str(tmp_path / "state.json")
+    state = CollectionState(state_path)
+    state.set_pending("report-1.md", "repo", "tip1", ["a", "b"])
+    state.set_pending("report-2.md", "repo", "tip2", ["c"])
+    assert state.get_last_tip("repo") is None
+
+    state.finalize_pending(["report-1.md"])
+    state.save()
+
+    state = CollectionState(state_path)
+    assert state.get_last_tip("repo") == "tip1"
+    assert state.get_reported_commits("repo") == {"a", "b"}
+    assert state.pending == {}
+    assert os.stat(state_path).st_mode & 0o777 == 0o666 & ~UMASK
+
+
+def test_reported_commits_accumulate_in_order(tmp_path):
+    state = CollectionState(str(tmp_path / "state.json"))
+    state.set_pending("report-1.md", "repo", "tip1", ["a", "b"])
+    state.set_pending("report-2.md", "repo", "tip2", ["b", "c"])
+    # Applied in report order, whatever order the reports were archived in
+    state.finalize_pending(["report-2.md", "report-1.md"])
+    assert state.get_last_tip("repo") == "tip2"
+    assert state.repositories["repo"]["reported_commits"] == ["a", "b", "c"]
+
+
+def test_collection_starts_at_the_watermark(git_repo, make_config):
+    git_repo.commit("Reported", {"a.txt": "a\n"})
+    tip = git_repo.commit("Reported too", {"a.txt": "aa\n"})
+    git_repo.commit("New", {"b.txt": "b\n"})
+    config = make_config(repository=[git_repo.path])
+    collector = GitDataCollector(config_loader=config, repo_path=git_repo.path)
+
+    commits = collector.collect_commits(datetime(2020, 1, 1), since_commit=tip)
+    assert [commit.message for commit in commits] == ["New"]
+    # A watermark that no longer exists, e.g. after a force push, falls back to the date
+    commits = collector.collect_commits(datetime(2020, 1, 1), since_commit="0" * 40)
+    assert len(commits) == 3
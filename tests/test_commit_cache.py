@@ -0,0 +1,69 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import commit_cache
+from commit_cache import CommitCache
+from git_data_collector import GitDataCollector
+from schemas import CommitRecord, StatsRecord
+
+
+def make_record(commit_id, diff="+line\n"):
+    return CommitRecord(
+        id=commit_id,
+        author="Alice Kim",
+        email="alice@example.com",
+        date=datetime(2024, 1, 1),
+        message=f"Commit {commit_id}",
+        stats=StatsRecord(1, 0, 1, [("a.py", 1, 0)]),
+        diff=diff,
+        diff_total_lines=1,
+    )
+
+
+def test_other_fingerprint_is_a_miss(tmp_path):
+    cache = CommitCache(str(tmp_path / "commits.sqlite3"), max_size_bytes=1024 ** 2)
+    cache.put_many([make_record("a"), make_record("b")], "v1")
+
+    assert set(cache.get_many(["a", "b", "c"], "v1")) == {"a", "b"}
+    assert cache.get_many(["a", "b"], "v2") == {}
+    # Storing under the new fingerprint replaces the stale entry
+    cache.put_many([make_record("a", diff="+other\n")], "v2")
+    assert cache.get_many(["a"], "v2")["a"].diff == "+other\n"
+    assert set(cache.get_many(["a", "b"], "v1")) == {"b"}
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr(commit_cache, "time", SimpleNamespace(time=lambda: next(clock)))
+    size = len(json.dumps(make_record("a").to_dict()))
+    cache = CommitCache(str(tmp_path / "commits.sqlite3"), max_size_bytes=3 * size)
+    cache.put_many([make_record("a")], "v1")
+    cache.put_many([make_record("b")], "v1")
+    cache.put_many([make_record("c")], "v1")
+    # Reading a makes b the least recently used entry
+    cache.get_many(["a"], "v1")
+
+    cache.put_many([make_record("d")], "v1")
+
+    assert set(cache.get_many(["a", "b", "c", "d"], "v1")) == {"a", "c", "d"}
+    cache.close()
+
+
+def test_collector_misses_entries_of_other_settings(git_repo, make_config, tmp_path):
+    git_repo.commit("Add a", {"a.py": "".join(f"a {i}\n" for i in range(10))})
+    cache = CommitCache(str(tmp_path / "cache" / "commits.sqlite3"), max_size_bytes=1024 ** 2)
+
+    def collect(max_diff_lines):
+        config = make_config(repository=[git_repo.path], max_diff_lines=max_diff_lines)
+        collector = GitDataCollector(
+            config_loader=config, repo_path=git_repo.path, commit_cache=cache
+        )
+        return collector.collect_commits(datetime(2020, 1, 1))[0]
+
+    short = collect(5)
+    # A cache hit would return the diff cut at five lines
+    assert collect(200).diff.count("\n") > short.diff.count("\n")
+    assert collect(5).diff == short.diff
+    cache.close()
@@ -0,0 +1,17 @@
+import pytest
+
+
+@pytest.mark.parametrize(
+    "getter, key, default",
+    [
+        ("get_max_workers", "max_workers", 4),
+        ("get_tokenizer_threads", "tokenizer_threads", 8),
+        ("get_cache_max_size_mb", "cache_max_size_mb", 256),
+        ("get_directory_depth", "directory_depth", 1),
+        ("get_breakdown_limit", "breakdown_limit", 10),
+    ],
+)
+def test_empty_numeric_setting_falls_back_to_the_default(make_config, getter, key, default):
+    # An empty YAML key loads as None
+    assert getattr(make_config(**{key: None}), getter)() == default
+    assert getattr(make_config(), getter)() == default
@@ -0,0 +1,63 @@
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+from dataset import DATASET_FORMATS, read_dataset, write_dataset
+from main import summarize_commit_data
+from schemas import CommitRecord, StatsRecord
+
+
+def make_commit(index, per_file):
+    return CommitRecord(
+        id=f"{index:040x}",
+        author="Alice Kim",
+        email="alice@example.com",
+        date=datetime(2024, 5, 6, 9, index, tzinfo=timezone.utc),
+        message=f"Change {index}\n\nWith a body",
+        stats=StatsRecord(
+            sum(change[1] for change in per_file),
+            sum(change[2] for change in per_file),
+            len(per_file),
+            per_file,
+        ),
+        diff=f"diff --git a/a.py b/a.py\n+line {index}",
+        diff_total_lines=40,
+        patch_id=f"{index:040x}"[::-1],
+    )
+
+
+def make_project(name, commits):
+    return {
+        "project_name": name,
+        "repo_path": f"/src/{name}",
+        "head_commit": "f" * 40,
+        "recent_commits": commits,
+        "summary": summarize_commit_data(commits),
+    }
+
+
+@pytest.mark.parametrize("dataset_format", sorted(DATASET_FORMATS))
+def test_dataset_round_trip(tmp_path, dataset_format):
+    project_data = [
+        make_project("service", [make_commit(1, [("a.py", 3, 1)]), make_commit(2, [])]),
+        make_project("empty", []),
+        make_project("web", [make_commit(3, [("a.py", 1, 0), ("b/c.ts", 0, 7)])]),
+    ]
+    since_date = datetime(2024, 5, 1)
+    path = str(tmp_path / f"dataset{DATASET_FORMATS[dataset_format]}")
+
+    write_dataset(path, project_data, "alice", since_date, dataset_format)
+    dataset = read_dataset(path)
+
+    assert dataset.member == "alice"
+    assert dataset.since_date == since_date
+    assert dataset.project_data == project_data
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / "dataset.jsonl"
+    path.write_text('{"type": "project"}\n', encoding="utf-8")
+    with pytest.raises(ValueError, match="Not a dataset file"):
+        read_dataset(str(path))
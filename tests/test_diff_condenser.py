@@ -0,0 +1,42 @@
+import pytest
+
+from diff_condenser import condense_diff
+
+
+def make_file_diff(path, hunks, hunk_lines):
+    lines = [f"diff --git a/{path} b/{path}", "index 1111111..2222222 100644"]
+    lines += [f"--- a/{path}", f"+++ b/{path}"]
+    for hunk in range(hunks):
+        start = hunk * 100 + 1
+        lines.append(f"@@ -{start},{hunk_lines} +{start},{hunk_lines} @@ def block_{hunk}():")
+        for line in range(hunk_lines):
+            lines.append(f"-    old_{path}_{hunk}_{line} = {line}")
+            lines.append(f"+    new_{path}_{hunk}_{line} = {line + 1}")
+    return lines
+
+
+def make_diff(files):
+    return "\n".join(
+        line
+        for index, (hunks, hunk_lines) in enumerate(files)
+        for line in make_file_diff(f"src/module_{index}.py", hunks, hunk_lines)
+    )
+
+
+@pytest.mark.parametrize(
+    "files",
+    [[(3, 4)] * 5, [(1, 30), (2, 3), (6, 2)], [(1, 2)] * 25],
+    ids=["several files", "uneven files", "more files than the index lists"],
+)
+def test_condensed_diff_fills_its_limit(files):
+    diff = make_diff(files)
+    for max_lines in range(8, 60):
+        condensed = condense_diff(diff, max_lines)
+        assert max_lines - 2 <= len(condensed.lines) <= max_lines
+
+
+def test_short_diff_is_kept_whole():
+    condensed = condense_diff(make_diff([(1, 2), (1, 1)]), 50)
+    assert not condensed.omitted
+    # Each file keeps its diff --git line, @@ line and changes; index and ---/+++ lines are dropped
+    assert condensed.diff_lines == len(condensed.lines) == (1 + 1 + 4) + (1 + 1 + 2)
@@ -0,0 +1,181 @@
+import subprocess
+from datetime import datetime
+
+import pytest
+
+from conftest import AUTHOR
+from git_data_collector import LOG_FORMAT, DiffBuffer, GitDataCollector, parse_log_stream
+from main import summarize_commit_data
+from schemas import StatsRecord
+
+SINCE = datetime(2020, 1, 1)
+
+
+def make_lines(name, count):
+    return "".join(f"{name} line {i}\n" for i in range(count))
+
+
+@pytest.fixture
+def renamed_repo(git_repo):
+    git_repo.commit(
+        "Add modules", {"src/a.py": make_lines("a", 40), "src/b.py": make_lines("b", 10)}
+    )
+    # Renamed with an edit, so git still detects the rename
+    git_repo.commit(
+        "Rename a to c",
+        {
+            "src/a.py": None,
+            "src/c.py": make_lines("a", 39) + "changed\n",
+            "src/b.py": make_lines("b", 12),
+        },
+    )
+    git_repo.commit("Edit c", {"src/c.py": make_lines("c", 5)})
+    return git_repo
+
+
+@pytest.mark.parametrize(
+    "settings",
+    [{}, {"exclude_paths": ["**/b.py"], "filter_stats": True}],
+    ids=["all paths", "path filters"],
+)
+def test_collection_modes_count_renames_alike(renamed_repo, make_config, settings):
+    summaries = []
+    stats = []
+    for collection_mode in ["batch", "per_commit"]:
+        config = make_config(
+            repository=[{"path": renamed_repo.path, **settings}], collection_mode=collection_mode
+        )
+        collector = GitDataCollector(config_loader=config, repo_path=renamed_repo.path)
+        commits = collector.collect_commits(SINCE)
+        summaries.append(summarize_commit_data(commits))
+        stats.append({commit.message: commit.stats for commit in commits})
+
+    assert summaries[0] == summaries[1]
+    assert stats[0] == stats[1]
+
+
+def test_renamed_file_stats_match_gitpython(renamed_repo, make_config):
+    config = make_config(repository=[renamed_repo.path])
+    collector = GitDataCollector(config_loader=config, repo_path=renamed_repo.path)
+    commit = next(c for c in collector.collect_commits(SINCE) if c.message == "Rename a to c")
+
+    total = collector.repo.commit(commit.id).stats.total
+    assert (commit.stats.insertions, commit.stats.deletions, commit.stats.files) == (
+        total["insertions"],
+        total["deletions"],
+        total["files"],
+    )
+    # The patch still shows the rename
+    assert "rename from src/a.py" in commit.diff
+
+
+def read_log_stream(repo, *args):
+    output = subprocess.run(
+        ["git", "log", f"--format={LOG_FORMAT}", "--numstat", "-p", *args],
+        cwd=repo.path,
+        check=True,
+        capture_output=True,
+    ).stdout
+    return output.splitlines(keepends=True)
+
+
+def test_parse_log_stream(git_repo):
+    first = git_repo.commit(
+        "Add module\n\nWith a body\nover two lines", {"a.py": make_lines("a", 3)}
+    )
+    second = git_repo.commit(
+        "Edit and add a binary", {"a.py": make_lines("a", 2), "logo.png": "\x00\x01"}
+    )
+
+    commits = list(parse_log_stream(read_log_stream(git_repo)))
+
+    assert [commit.id for commit in commits] == [second, first]
+    assert commits[1].message == "Add module\n\nWith a body\nover two lines"
+    assert (commits[1].author, commits[1].email) == AUTHOR
+    assert commits[1].stats == StatsRecord(3, 0, 1, [("a.py", 3, 0)])
+    assert commits[0].stats == StatsRecord(0, 1, 2, [("a.py", 0, 1), ("logo.png", 0, 0)])
+    assert commits[0].diff.startswith("diff --git a/a.py b/a.py")
+    assert "Binary files /dev/null and b/logo.png differ" in commits[0].diff
+    assert commits[0].diff_total_lines == len(commits[0].diff.splitlines())
+
+    # Binary files are left out of the stats and the diff alike
+    commits = list(parse_log_stream(read_log_stream(git_repo, "-1"), skip_binary_files=True))
+    assert commits[0].stats == StatsRecord(0, 1, 1, [("a.py", 0, 1)])
+    assert "logo.png" not in commits[0].diff
+
+
+def diff_lines(*files):
+    lines = []
+    for path, changes in files:
+        lines += [f"diff --git a/{path} b/{path}\n", f"--- a/{path}\n", f"+++ b/{path}\n"]
+        lines += [f"@@ -1,{changes} +1,{changes} @@\n"]
+        lines += [f"+{path} {line}\n" for line in range(changes)]
+    return [line.encode() for line in lines]
+
+
+def test_diff_buffer_keeps_the_first_lines():
+    lines = diff_lines(("a.py", 10), ("b.py", 10))
+    diff_buffer = DiffBuffer(max_lines=5)
+    for line in lines:
+        diff_buffer.add(line)
+
+    assert diff_buffer.getvalue() == b"".join(lines[:5]).decode().rstrip("\n")
+    assert diff_buffer.total_lines == len(lines)
+    # The patch ID covers the lines not kept
+    full_buffer = DiffBuffer()
+    for line in lines:
+        full_buffer.add(line)
+    assert diff_buffer.patch_id_hasher.hexdigest() == full_buffer.patch_id_hasher.hexdigest()
+
+
+def test_diff_buffer_keeps_every_file_header():
+    lines = diff_lines(("a.py", 10), ("b.py", 10), ("c.py", 10))
+    diff_buffer = DiffBuffer(max_lines=10, max_file_lines=4)
+    for line in lines:
+        diff_buffer.add(line)
+
+    kept = diff_buffer.getvalue().splitlines()
+    # a.py and b.py keep four lines after their diff --git line, which use up max_lines;
+    # c.py's diff --git line is kept past it
+    assert kept == [
+        line.decode().rstrip("\n") for line in lines[0:5] + lines[14:19] + lines[28:29]
+    ]
+    assert diff_buffer.total_lines == len(lines)
+
+
+@pytest.mark.parametrize("collection_mode", ["batch", "per_commit"])
+def test_generated_files_are_skipped(git_repo, make_config, collection_mode):
+    git_repo.commit(
+        "Mark generated files",
+        {".gitattributes": "gen/set.py linguist-generated\ngen/true.py linguist-generated=true\n"},
+    )
+    git_repo.commit(
+        "Regenerate",
+        {
+            "src/app.py": "app\n",
+            "package-lock.json": "{}\n",
+            "web/app.min.js": "x\n",
+            "proto/api_pb2.py": "pb\n",
+            "gen/set.py": "set\n",
+            "gen/true.py": "true\n",
+            "gen/false.py": "false\n",
+        },
+    )
+
+    def collect(skip_generated_files):
+        config = make_config(
+            repository=[{"path": git_repo.path, "skip_generated_files": skip_generated_files}],
+            collection_mode=collection_mode,
+            max_diff_lines=200,
+        )
+        collector = GitDataCollector(config_loader=config, repo_path=git_repo.path)
+        return collector.collect_commits(SINCE)[0]
+
+    commit = collect(True)
+    assert [line for line in commit.diff.splitlines() if line.startswith("diff --git")] == [
+        "diff --git a/gen/false.py b/gen/false.py",
+        "diff --git a/src/app.py b/src/app.py",
+    ]
+    # The stats still count every file unless filter_stats is set
+    assert commit.stats.files == 7
+    assert collect(False).diff.count("diff --git") == 7
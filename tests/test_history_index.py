@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+
+from history_index import HistoryIndex
+
+
+def write_report(history_dir, filename, content, mtime=None):
+    path = os.path.join(history_dir, filename)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_latest_is_newest_first(tmp_path):
+    history_dir = str(tmp_path)
+    write_report(history_dir, "report-20240108-090000.md", "second")
+    write_report(history_dir, "report-20240101-090000.md", "first")
+    write_report(history_dir, "report-20240115-090000.md", "third")
+    # Named by hand, so dated by its modification time, 2024-01-10
+    write_report(history_dir, "report-by-hand.md", "by hand", mtime=1704880800)
+    write_report(history_dir, "notes.md", "not a report")
+
+    index = HistoryIndex(history_dir)
+
+    assert [entry.filename for entry in index.latest()] == [
+        "report-20240115-090000.md",
+        "report-by-hand.md",
+        "report-20240108-090000.md",
+        "report-20240101-090000.md",
+    ]
+    assert [entry.filename for entry in index.latest(2)] == [
+        "report-20240115-090000.md",
+        "report-by-hand.md",
+    ]
+    assert index.latest()[0].sha256 == hashlib.sha256(b"third").hexdigest()
+
+
+def test_saved_index_is_refreshed_with_changed_files(tmp_path):
+    history_dir = str(tmp_path)
+    write_report(history_dir, "report-20240101-090000.md", "first", mtime=1704100000)
+    write_report(history_dir, "report-20240108-090000.md", "second", mtime=1704700000)
+    HistoryIndex(history_dir).refresh()
+    with open(os.path.join(history_dir, "index.json"), encoding="utf-8") as f:
+        assert [entry["filename"] for entry in json.load(f)["reports"]] == [
+            "report-20240101-090000.md",
+            "report-20240108-090000.md",
+        ]
+
+    write_report(history_dir, "report-20240115-090000.md", "third")
+    write_report(history_dir, "report-20240108-090000.md", "second, edited", mtime=1704800000)
+    os.remove(os.path.join(history_dir, "report-20240101-090000.md"))
+    index = HistoryIndex(history_dir)
+
+    entries = index.latest()
+    assert [entry.filename for entry in entries] == [
+        "report-20240115-090000.md",
+        "report-20240108-090000.md",
+    ]
+    assert entries[1].sha256 == hashlib.sha256(b"second, edited").hexdigest()
+    assert entries[1].size == len("second, edited")
+
+
+def test_added_report_is_listed_without_a_refresh(tmp_path):
+    history_dir = str(tmp_path)
+    index = HistoryIndex(history_dir)
+    assert index.latest() == []
+
+    write_report(history_dir, "report-20240101-090000.md", "first")
+    index.add("report-20240101-090000.md", b"first")
+
+    assert [entry.filename for entry in index.latest()] == ["report-20240101-090000.md"]
+    assert [entry.filename for entry in HistoryIndex(history_dir).entries.values()] == [
+        "report-20240101-090000.md"
+    ]
@@ -0,0 +1,93 @@
+import os
+import subprocess
+from datetime import datetime
+
+import pytest
+
+from mirror_cache import MIRROR_REF, SHALLOW_SINCE_CONFIG_KEY, MirrorCache
+
+
+def mirror_git(path, *args):
+    return subprocess.run(
+        ["git", "-C", path, *args], check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+def commit_date(repo, commit_id):
+    """Return the commit's date as the naive local time MirrorCache is given."""
+    return datetime.fromtimestamp(int(repo.git("log", "-1", "--format=%ct", commit_id)))
+
+
+@pytest.fixture
+def remote(git_repo):
+    # Lets a file:// clone ask for a blobless pack
+    git_repo.git("config", "uploadpack.allowFilter", "true")
+    git_repo.commit_ids = [
+        git_repo.commit(f"Change {index}", {"a.txt": f"{index}\n"}) for index in range(5)
+    ]
+    git_repo.url = f"file://{git_repo.path}"
+    return git_repo
+
+
+@pytest.fixture
+def mirror_cache(tmp_path):
+    return MirrorCache(str(tmp_path / "mirrors"))
+
+
+def test_first_update_fetches_the_window(remote, mirror_cache):
+    path = mirror_cache.update(remote.url, commit_date(remote, remote.commit_ids[2]))
+
+    assert os.path.basename(path).startswith("repo-")
+    assert mirror_git(path, "rev-parse", "--is-bare-repository") == "true"
+    assert mirror_git(path, "symbolic-ref", "HEAD") == MIRROR_REF
+    assert mirror_git(path, "rev-parse", "HEAD") == remote.commit_ids[-1]
+    # The window, plus the commit before it so its first commit has a parent to diff against
+    assert mirror_git(path, "rev-list", "HEAD").split() == remote.commit_ids[:0:-1]
+    assert mirror_git(path, "rev-parse", "--is-shallow-repository") == "true"
+    assert mirror_git(path, "config", "remote.origin.partialclonefilter") == "blob:none"
+    # Blobs are left for git to fetch when a diff needs them
+    objects = mirror_git(path, "rev-list", "--objects", "--missing=print", "HEAD").splitlines()
+    assert sum(line.startswith("?") for line in objects) == 4
+
+
+def test_earlier_window_deepens_the_mirror(remote, mirror_cache):
+    mirror_cache.update(remote.url, commit_date(remote, remote.commit_ids[3]))
+    since_date = commit_date(remote, remote.commit_ids[1])
+    path = mirror_cache.update(remote.url, since_date)
+
+    assert mirror_git(path, "rev-list", "HEAD").split() == remote.commit_ids[::-1]
+    assert mirror_git(path, "config", SHALLOW_SINCE_CONFIG_KEY) == str(int(since_date.timestamp()))
+
+
+def test_later_update_fetches_only_new_commits(remote, mirror_cache):
+    since_date = commit_date(remote, remote.commit_ids[3])
+    path = mirror_cache.update(remote.url, since_date)
+    with open(os.path.join(path, "shallow")) as f:
+        shallow_commits = f.read()
+
+    new_commit = remote.commit("Change 5", {"a.txt": "5\n"})
+    assert mirror_cache.update(remote.url, since_date) == path
+
+    assert mirror_git(path, "rev-parse", "HEAD") == new_commit
+    assert mirror_git(path, "rev-list", "HEAD").split() == [new_commit] + remote.commit_ids[:1:-1]
+    # Fetched without --shallow-since, so the history boundary did not move
+    with open(os.path.join(path, "shallow")) as f:
+        assert f.read() == shallow_commits
+
+
+def test_branch_mirrors_are_kept_apart(remote, mirror_cache):
+    remote.git("checkout", "-q", "-b", "feature")
+    feature_commit = remote.commit("Feature", {"b.txt": "b\n"})
+    remote.git("checkout", "-q", "main")
+    since_date = commit_date(remote, remote.commit_ids[3])
+
+    path = mirror_cache.update(remote.url, since_date, branch="feature")
+
+    assert path != mirror_cache.get_mirror_path(remote.url)
+    assert mirror_git(path, "rev-parse", "HEAD") == feature_commit
+
+
+def test_get_remote_head(remote):
+    assert MirrorCache.get_remote_head(remote.url) == remote.commit_ids[-1]
+    assert MirrorCache.get_remote_head(remote.url, "main") == remote.commit_ids[-1]
+    assert MirrorCache.get_remote_head(remote.url, "missing") is None
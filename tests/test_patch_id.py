@@ -0,0 +1,77 @@
+from datetime import datetime
+
+from git_data_collector import GitDataCollector
+from main import summarize_commit_data
+from patch_id import PatchIdHasher
+from prompt_generator import PromptGenerator
+
+
+def patch_id(*lines):
+    hasher = PatchIdHasher()
+    for line in lines:
+        hasher.update(line.encode() + b"\n")
+    return hasher.hexdigest()
+
+
+def file_diff(path, blob_ids="1111111..2222222", start=1, added="+x = 1"):
+    return [
+        f"diff --git a/{path} b/{path}",
+        f"index {blob_ids} 100644",
+        f"--- a/{path}",
+        f"+++ b/{path}",
+        f"@@ -{start},1 +{start},2 @@",
+        " context",
+        added,
+    ]
+
+
+def test_patch_id_ignores_position_blob_ids_and_file_order():
+    first = patch_id(*file_diff("a.py"), *file_diff("b.py"))
+
+    assert first == patch_id(*file_diff("b.py", start=40), *file_diff("a.py", "3333333..4444444"))
+    assert first == patch_id(*file_diff("a.py", added="+x  =  1"), *file_diff("b.py"))
+    assert first != patch_id(*file_diff("a.py", added="+x = 2"), *file_diff("b.py"))
+    assert first != patch_id(*file_diff("a.py"))
+    assert patch_id() == ""
+
+
+def test_cherry_picked_commit_is_shown_once(git_repo, make_config, encoding):
+    lines = "".join(f"line {i}\n" for i in range(20))
+    git_repo.commit("Add module", {"module.py": lines})
+    git_repo.git("checkout", "-q", "-b", "release")
+    git_repo.commit("Prepare release", {"module.py": "header\n" + lines})
+    git_repo.git("checkout", "-q", "main")
+    fix = git_repo.commit("Fix line 15", {"module.py": lines.replace("line 15", "line 15 fixed")})
+    git_repo.git("checkout", "-q", "release")
+    git_repo.git("cherry-pick", fix, env={"GIT_COMMITTER_DATE": "1700001000 +0000"})
+    picked = git_repo.git("rev-parse", "HEAD")
+    config = make_config(repository=[git_repo.path])
+
+    collector = GitDataCollector(config_loader=config, repo_path=git_repo.path)
+    commits = {
+        commit.id: commit
+        for branch in ["main", "release"]
+        for commit in collector.collect_commits(datetime(2020, 1, 1), until_commit=branch)
+    }
+
+    # The hunk moved down a line, so the blob IDs and line numbers differ
+    assert commits[picked].diff != commits[fix].diff
+    assert commits[picked].patch_id == commits[fix].patch_id
+    assert commits[picked].patch_id != commits[git_repo.git("rev-parse", "HEAD~1")].patch_id
+
+    project_data = [
+        {
+            "project_name": "module",
+            "repo_path": git_repo.path,
+            "recent_commits": [commits[picked], commits[fix]],
+            "summary": summarize_commit_data(list(commits.values())),
+        }
+    ]
+    prompt = PromptGenerator(project_data, config).generate_prompt()
+    assert prompt.count("+line 15 fixed") == 1
+    assert f"(Same changes as {picked[:7]} in [module], whose diff is shown above)" in prompt
+
+    config = make_config(repository=[git_repo.path], diff_deduplication=False)
+    prompt = PromptGenerator(project_data, config).generate_prompt()
+    assert prompt.count("+line 15 fixed") == 2
+    assert "Same changes as" not in prompt
@@ -0,0 +1,110 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from main import build_summary_table, summarize_commit_data
+from prompt_generator import PromptGenerator
+from schemas import CommitRecord, StatsRecord
+from token_counter import count_tokens
+
+
+def make_commit(index, rng):
+    """Make a commit changing a few long-named files with short diff lines.
+
+    The index of a condensed diff then costs more than the diff lines it replaces.
+    """
+    lines = []
+    per_file = []
+    for file_index in range(rng.randint(1, 8)):
+        path = f"services/billing/internal/handlers/reconciliation_{index}_{file_index}.py"
+        lines += [f"diff --git a/{path} b/{path}", "index 1111111..2222222 100644"]
+        lines += [f"--- a/{path}", f"+++ b/{path}"]
+        hunks, hunk_lines = rng.randint(1, 4), rng.randint(2, 12)
+        for hunk in range(hunks):
+            lines.append(f"@@ -{hunk * 50 + 1},{hunk_lines} +{hunk * 50 + 1},{hunk_lines} @@")
+            lines += [rng.choice([" x", "+y = 1", "-z", "+q"]) for _ in range(hunk_lines)]
+        per_file.append((path, hunks * hunk_lines // 2, hunks * hunk_lines // 2))
+    changes = sum(insertions for _, insertions, _ in per_file)
+    return CommitRecord(
+        id=f"{index:040x}",
+        author="Alice Kim",
+        email="alice@example.com",
+        date=datetime(2024, 5, 6, tzinfo=timezone.utc) + timedelta(hours=index),
+        message=f"Change {index}",
+        stats=StatsRecord(changes, changes, len(per_file), per_file),
+        diff="\n".join(lines),
+        diff_total_lines=len(lines),
+    )
+
+
+@pytest.fixture
+def project_data():
+    rng = random.Random(1)
+    commits = [make_commit(index, rng) for index in range(8)]
+    return [
+        {
+            "project_name": "service",
+            "repo_path": "service",
+            "head_commit": "0" * 40,
+            "recent_commits": commits,
+            "summary": summarize_commit_data(commits),
+        }
+    ]
+
+
+@pytest.mark.parametrize("max_diff_lines", [20, 40])
+@pytest.mark.parametrize("diff_condensation", [False, True])
+def test_prompt_fits_token_budget(
+    encoding, make_config, project_data, diff_condensation, max_diff_lines
+):
+    config = make_config(max_diff_lines=max_diff_lines, diff_condensation=diff_condensation)
+
+    def generate(**kwargs):
+        return PromptGenerator(project_data, config).generate_prompt(**kwargs)
+
+    fixed_tokens = count_tokens(generate(should_include_diff=False))
+    full_tokens = count_tokens(generate())
+    prompt_tokens = []
+    for step in range(1, 10):
+        token_budget = fixed_tokens + (full_tokens - fixed_tokens) * step // 10
+        prompt_tokens.append(count_tokens(generate(token_budget=token_budget)))
+        assert prompt_tokens[-1] <= token_budget
+    # More budget shows more of the diffs
+    assert prompt_tokens[0] < prompt_tokens[-1]
+
+
+def test_breakdowns_are_cut_to_breakdown_limit(encoding, make_config, project_data):
+    # Eight commits a day apart, each also touching a directory of its own
+    commits = project_data[0]["recent_commits"]
+    for index, commit in enumerate(commits):
+        commit.date = datetime(2024, 5, 6, tzinfo=timezone.utc) + timedelta(days=index)
+        commit.stats.per_file[0] = (f"dir{index}/a.py", 1, 1)
+    project_data[0]["summary"] = summarize_commit_data(commits)
+    config = make_config(activity_breakdowns=["daily", "directories"], breakdown_limit=3)
+
+    prompt = PromptGenerator(project_data, config).generate_prompt(should_include_diff=False)
+
+    assert "  - ... 5 earlier periods omitted" in prompt
+    for day in ["2024-05-11", "2024-05-12", "2024-05-13"]:
+        assert f"  - {day}: 1 commits" in prompt
+    assert "  - 2024-05-10:" not in prompt
+    assert "- Weekly activity:" not in prompt
+    assert "- Most changed directories:" in prompt
+    # services/ and dir0/ to dir7/
+    assert "  - ... and 6 more directories" in prompt
+
+
+def test_tokens_are_counted_per_repository(encoding, make_config, project_data):
+    # Two checkouts with the same directory name
+    project_data.append({**project_data[0], "repo_path": "other/service"})
+    prompt_gen = PromptGenerator(project_data, make_config())
+    prompt_gen.generate_prompt()
+
+    counts = prompt_gen.project_token_counts
+    assert set(counts) == {"service", "other/service"}
+    assert counts["service"] > 0
+    table = build_summary_table(project_data, counts)
+    tokens = list(table.columns[-1].cells)
+    assert tokens[:2] == [str(counts["service"]), str(counts["other/service"])]
+    assert tokens[2] == f"[bold]{sum(counts.values())}[/bold]"
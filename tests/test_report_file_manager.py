@@ -0,0 +1,39 @@
+from profiler import Profiler
+from report_file_manager import read_bounded_text
+from token_counter import count_tokens
+
+
+def test_multibyte_text_is_cut_to_the_token_cap(encoding, tmp_path):
+    path = tmp_path / "memo.md"
+    # Fewer characters than the cap, but each Hangul syllable takes several tokens
+    memo = "# 회의 메모\n" + "이번 주에는 결제 모듈을 정리했습니다.\n" * 40
+    path.write_text(memo, encoding="utf-8")
+    max_tokens = 1000
+    assert len(memo) < max_tokens < count_tokens(memo)
+
+    text = read_bounded_text(str(path), max_tokens=max_tokens)
+
+    kept, note = text.rsplit("\n\n", 1)
+    assert memo.startswith(kept)
+    assert count_tokens(kept) <= max_tokens
+    assert note.startswith("[... Truncated: showing the first ")
+
+
+def test_cut_off_part_is_scanned_only_so_far(tmp_path, monkeypatch):
+    import report_file_manager
+
+    profiler = Profiler()
+    profiler.enable()
+    monkeypatch.setattr(report_file_manager, "profiler", profiler)
+    monkeypatch.setattr(report_file_manager, "MAX_HEADING_SCAN_BYTES", 4096)
+    path = tmp_path / "report.md"
+    sections = [f"## Section {index}\n" + "Details of the week.\n" * 20 for index in range(100)]
+    path.write_text("".join(sections), encoding="utf-8")
+
+    text = read_bounded_text(str(path), max_bytes=1024)
+
+    # Only the headings within the first 4 KB past the kept part are listed
+    listed = ", ".join(f"Section {index}" for index in range(3, 12))
+    assert text.endswith(f"Sections not shown: {listed} and possibly more]")
+    # The kept part, then the scan from the end of its last whole line
+    assert profiler.counters["report bytes read"] == 1024 + 4096
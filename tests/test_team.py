@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import pytest
+
+from main import collect_project_data
+from team import load_team_members
+
+BOB = ("Bob Lee", "bob@example.com")
+TEAM = [{"name": "alice", "author": "Alice Kim"}, {"name": "bob", "author": "Bob Lee"}]
+
+
+@pytest.fixture
+def mailmapped_repo(git_repo):
+    git_repo.commit(
+        "Add mailmap", {".mailmap": "Alice Kim <alice@example.com> <alice@old.example>\n"}
+    )
+    git_repo.commit("Old address", {"a.txt": "a\n"}, author=("alice", "alice@old.example"))
+    git_repo.commit("Bob's first", {"b.txt": "b\n"}, author=BOB)
+    git_repo.commit("Bob's second", {"b.txt": "bb\n"}, author=BOB)
+    return git_repo
+
+
+@pytest.mark.parametrize("collection_mode", ["batch", "per_commit"])
+def test_members_get_mailmapped_commits(mailmapped_repo, make_config, build_dir, collection_mode):
+    config = make_config(
+        team=TEAM,
+        repository=[mailmapped_repo.path],
+        collection_mode=collection_mode,
+        incremental_collection=False,
+    )
+    members = load_team_members(config)
+    for member in members:
+        member.since_date = datetime(2020, 1, 1)
+
+    project = collect_project_data(config, mailmapped_repo.path, members)
+
+    alice_commits, bob_commits = project["member_commits"]
+    assert [commit.message for commit in alice_commits] == ["Old address", "Add mailmap"]
+    assert {(commit.author, commit.email) for commit in alice_commits} == {
+        ("Alice Kim", "alice@example.com")
+    }
+    assert [commit.message for commit in bob_commits] == ["Bob's second", "Bob's first"]
+
+
+@pytest.mark.parametrize(
+    "settings",
+    [{"author": None}, {"author": None, "team": [{"name": "alice", "author_patterns": []}]}],
+    ids=["single author", "team member"],
+)
+def test_member_without_author_is_rejected(make_config, build_dir, settings):
+    with pytest.raises(ValueError, match="No author configured"):
+        load_team_members(make_config(**settings))
@@ -0,0 +1,60 @@
+import os
+
+from team import load_team_members
+from watcher import RepositoryWatcher
+
+
+def make_watcher(config, repo_paths):
+    return RepositoryWatcher(config, repo_paths, load_team_members(config))
+
+
+def test_changed_repositories(git_repo, make_config, build_dir, tmp_path):
+    git_repo.commit("First", {"a.txt": "a\n"})
+    missing_path = str(tmp_path / "missing")
+    config = make_config(repository=[git_repo.path, missing_path])
+    watcher = make_watcher(config, [git_repo.path, missing_path])
+
+    # Everything is collected on the first poll
+    assert watcher.changed_repositories() == [git_repo.path, missing_path]
+    assert watcher.get_collector(missing_path) is None
+    assert watcher.changed_repositories() == []
+
+    git_repo.commit("Second", {"a.txt": "b\n"})
+    assert watcher.changed_repositories() == [git_repo.path]
+    assert watcher.changed_repositories() == []
+
+    # A branch switch moves the checked-out commit too
+    git_repo.git("checkout", "-q", "HEAD~1")
+    assert watcher.changed_repositories() == [git_repo.path]
+    head = git_repo.git("rev-parse", "HEAD")
+    assert watcher.get_collector(git_repo.path).get_head_commit() == head
+
+
+def test_repository_created_after_the_first_poll(git_repo, make_config, build_dir, tmp_path):
+    git_repo.commit("First", {"a.txt": "a\n"})
+    new_path = str(tmp_path / "new")
+    config = make_config(repository=[new_path])
+    watcher = make_watcher(config, [new_path])
+    assert watcher.changed_repositories() == [new_path]
+
+    git_repo.git("clone", "-q", git_repo.path, new_path)
+    assert watcher.changed_repositories() == [new_path]
+    assert watcher.get_collector(new_path) is not None
+
+
+def test_changed_memos(make_config, build_dir):
+    config = make_config(
+        team=[{"name": "alice", "author": "Alice Kim"}, {"name": "bob", "author": "Bob Lee"}]
+    )
+    watcher = make_watcher(config, [])
+    memo_path = os.path.join(build_dir, "bob", "memo.md")
+
+    # The first poll only records the memos
+    assert watcher.changed_memos() == []
+    with open(memo_path, "w", encoding="utf-8") as f:
+        f.write("Notes\n")
+    assert watcher.changed_memos() == [1]
+    assert watcher.changed_memos() == []
+
+    os.remove(memo_path)
+    assert watcher.changed_memos() == [1]
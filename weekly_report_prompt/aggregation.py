@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from schemas import ActivityStats, CommitDataSummary, CommitRecord
+
+ROOT_DIRECTORY = "(root)"
+
+
+class _Accumulator:
+    """Running totals for one day, week or directory."""
+
+    __slots__ = ("commits", "insertions", "deletions", "files")
+
+    def __init__(self):
+        self.commits = 0
+        self.insertions = 0
+        self.deletions = 0
+        self.files = 0
+
+    def add(self, insertions: int, deletions: int, files: int, commits: int = 1):
+        self.commits += commits
+        self.insertions += insertions
+        self.deletions += deletions
+        self.files += files
+
+    def to_stats(self, key: str) -> ActivityStats:
+        return ActivityStats(
+            key=key,
+            commits=self.commits,
+            insertions=self.insertions,
+            deletions=self.deletions,
+            files=self.files,
+        )
+
+
+def summarize_commits(
+    commits: List[CommitRecord], directory_depth: int = 1
+) -> CommitDataSummary:
+    """Compute the totals and the daily, weekly and per-directory breakdowns in a single pass.
+
+    Days and weeks follow each commit's own date, as shown in the prompt; weeks start on Monday.
+    Directories are cut to `directory_depth` levels, and a commit counts once per directory it touches.
+    """
+    totals = _Accumulator()
+    daily: Dict[str, _Accumulator] = {}
+    weekly: Dict[str, _Accumulator] = {}
+    directories: Dict[str, _Accumulator] = {}
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+
+    for commit in commits:
+        stats = commit.stats
+        date = commit.date
+        if start_date is None or date < start_date:
+            start_date = date
+        if end_date is None or date > end_date:
+            end_date = date
+        totals.add(stats.insertions, stats.deletions, stats.files)
+
+        day = date.date()
+        day_key = day.isoformat()
+        accumulator = daily.get(day_key)
+        if accumulator is None:
+            accumulator = daily[day_key] = _Accumulator()
+        accumulator.add(stats.insertions, stats.deletions, stats.files)
+
+        week_key = (day - timedelta(days=day.weekday())).isoformat()
+        accumulator = weekly.get(week_key)
+        if accumulator is None:
+            accumulator = weekly[week_key] = _Accumulator()
+        accumulator.add(stats.insertions, stats.deletions, stats.files)
+
+        touched = set()
+        for path, insertions, deletions in stats.per_file:
+            directory = get_directory(path, directory_depth)
+            accumulator = directories.get(directory)
+            if accumulator is None:
+                accumulator = directories[directory] = _Accumulator()
+            accumulator.add(insertions, deletions, 1, commits=directory not in touched)
+            touched.add(directory)
+
+    now = datetime.now()
+    return CommitDataSummary(
+        start_date=start_date or now,
+        end_date=end_date or now,
+        total_commits=totals.commits,
+        total_insertions=totals.insertions,
+        total_deletions=totals.deletions,
+        total_files_changed=totals.files,
+        daily=[daily[key].to_stats(key) for key in sorted(daily)],
+        weekly=[weekly[key].to_stats(key) for key in sorted(weekly)],
+        # Most changed first
+        directories=sorted(
+            (accumulator.to_stats(key) for key, accumulator in directories.items()),
+            key=lambda stats: (-(stats.insertions + stats.deletions), stats.key),
+        ),
+    )
+
+
+def merge_activity(breakdowns: List[List[ActivityStats]]) -> List[ActivityStats]:
+    """Add up breakdowns of several repositories by key, keeping the keys sorted."""
+    merged: Dict[str, _Accumulator] = {}
+    for breakdown in breakdowns:
+        for stats in breakdown:
+            accumulator = merged.get(stats.key)
+            if accumulator is None:
+                accumulator = merged[stats.key] = _Accumulator()
+            accumulator.add(stats.insertions, stats.deletions, stats.files, stats.commits)
+    return [merged[key].to_stats(key) for key in sorted(merged)]
+
+
+def get_directory(path: str, depth: int) -> str:
+    """Return the directory of a file path, cut to `depth` levels, with a trailing slash."""
+    parts = path.split("/")[:-1]
+    if not parts:
+        return ROOT_DIRECTORY
+    return "/".join(parts[:depth]) + "/"
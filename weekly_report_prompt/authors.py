@@ -0,0 +1,21 @@
+import re
+from typing import List
+
+
+def build_author_patterns(authors: List[str], author_patterns: List[str]) -> List[str]:
+    """Translate author names, emails and regexes into `git log --author` extended regexes.
+
+    git matches them against "Name <email>", so plain names and emails are anchored to match exactly.
+    """
+    patterns = []
+    for author in authors:
+        if "@" in author:
+            patterns.append(f"<{_escape_regex(author)}>$")
+        else:
+            patterns.append(f"^{_escape_regex(author)} <")
+    return patterns + list(author_patterns)
+
+
+def _escape_regex(text: str) -> str:
+    """Escape the POSIX extended regex metacharacters in the text."""
+    return re.sub(r"([.\[\]()*+?{}|^$\\])", r"\\\1", text)
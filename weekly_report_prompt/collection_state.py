@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+from typing import Dict, List, Optional, Set
+
+from file_modes import set_default_mode
+
+# Reported commit IDs kept per repository; older ones are far behind the watermark anyway
+MAX_REPORTED_COMMITS = 5000
+
+
+class CollectionState:
+    """Per-repository collection watermarks, persisted as JSON in the build directory.
+
+    Each run records the repository tips and the commits it put into the prompt as *pending*,
+    keyed by the report file created alongside the prompt. Only when that report is filled in and
+    archived does the pending entry become the watermark, so regenerating the prompt before the
+    report is written collects the same commits again.
+    """
+
+    def __init__(self, state_path: str):
+        self.state_path = state_path
+        self.repositories: Dict[str, Dict] = {}
+        self.pending: Dict[str, Dict[str, Dict]] = {}
+        if os.path.exists(state_path):
+            with open(state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self.repositories = state.get("repositories", {})
+            self.pending = state.get("pending", {})
+
+    def get_last_tip(self, repo_path: str) -> Optional[str]:
+        return self.repositories.get(repo_path, {}).get("last_tip")
+
+    def get_reported_commits(self, repo_path: str) -> Set[str]:
+        return set(self.repositories.get(repo_path, {}).get("reported_commits", []))
+
+    def set_pending(self, report_filename: str, repo_path: str, tip: str, commit_ids: List[str]):
+        """Remember what the prompt for the given report was built from."""
+        self.pending.setdefault(report_filename, {})[repo_path] = {
+            "tip": tip,
+            "commits": commit_ids,
+        }
+
+    def finalize_pending(self, archived_report_filenames: List[str]):
+        """Advance the watermarks for the archived reports and drop all other pending entries."""
+        for report_filename in sorted(archived_report_filenames):
+            for repo_path, entry in self.pending.get(report_filename, {}).items():
+                repository = self.repositories.setdefault(repo_path, {})
+                repository["last_tip"] = entry["tip"]
+                reported_commits = repository.get("reported_commits", [])
+                known_commits = set(reported_commits)
+                reported_commits += [
+                    commit_id
+                    for commit_id in entry["commits"]
+                    if commit_id not in known_commits
+                ]
+                repository["reported_commits"] = reported_commits[-MAX_REPORTED_COMMITS:]
+        self.pending = {}
+
+    def save(self):
+        """Write the state atomically."""
+        state_dir = os.path.dirname(self.state_path)
+        fd, tmp_path = tempfile.mkstemp(dir=state_dir, prefix=".state-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"repositories": self.repositories, "pending": self.pending},
+                    f,
+                    indent=2,
+                )
+            set_default_mode(tmp_path)
+            os.replace(tmp_path, self.state_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
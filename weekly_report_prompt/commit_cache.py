@@ -0,0 +1,95 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List
+
+from schemas import CommitRecord
+
+
+class CommitCache:
+    """SQLite-backed cache of collected commits, keyed by commit SHA.
+
+    Commits are immutable, so an entry only becomes stale when the collection settings change.
+    Each entry stores the settings fingerprint it was collected with, and a mismatch is treated as a miss.
+    """
+
+    def __init__(self, cache_path: str, max_size_bytes: int):
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        self.cache_path = cache_path
+        self.max_size_bytes = max_size_bytes
+        # Shared between collector threads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS commits ("
+            "id TEXT PRIMARY KEY, "
+            "fingerprint TEXT NOT NULL, "
+            "data TEXT NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS commits_accessed_at ON commits (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get_many(self, commit_ids: List[str], fingerprint: str) -> Dict[str, CommitRecord]:
+        """Return cached commits for the given IDs, skipping misses and stale entries."""
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound parameter limit
+            for start in range(0, len(commit_ids), 500):
+                chunk = commit_ids[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT id, data FROM commits WHERE fingerprint = ? AND id IN ({placeholders})",
+                    [fingerprint, *chunk],
+                ).fetchall()
+                for commit_id, data in rows:
+                    found[commit_id] = CommitRecord.from_dict(json.loads(data))
+            if found:
+                self._conn.executemany(
+                    "UPDATE commits SET accessed_at = ? WHERE id = ?",
+                    [(time.time(), commit_id) for commit_id in found],
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, commits: Iterable[CommitRecord], fingerprint: str):
+        """Store commits in the cache and evict the least recently used entries if it grows too large."""
+        now = time.time()
+        rows = []
+        for commit in commits:
+            data = json.dumps(commit.to_dict())
+            rows.append((commit.id, fingerprint, data, len(data), now))
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO commits (id, fingerprint, data, size, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (total_size,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM commits"
+        ).fetchone()
+        if total_size <= self.max_size_bytes:
+            return
+        expired = []
+        for commit_id, size in self._conn.execute(
+            "SELECT id, size FROM commits ORDER BY accessed_at ASC"
+        ):
+            if total_size <= self.max_size_bytes:
+                break
+            expired.append((commit_id,))
+            total_size -= size
+        self._conn.executemany("DELETE FROM commits WHERE id = ?", expired)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
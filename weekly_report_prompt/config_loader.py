@@ -28,20 +28,112 @@ class ConfigLoader:
     def get(self, key, default=None):
         return self.config.get(key, default)
 
-    def get_author(self):
-        return self.config.get("author")
+    def get_authors(self):
+        """Return the configured author names and emails as a list."""
+        authors = self.config.get("author") or []
+        if isinstance(authors, str):
+            authors = [authors]
+        return authors
+
+    def get_author_patterns(self):
+        return self.config.get("author_patterns", [])
+
+    def get_team(self):
+        """Return the team members, each with a name, a list of authors, author patterns and a build directory."""
+        members = []
+        for member in self.config.get("team") or []:
+            authors = member.get("author") or []
+            if isinstance(authors, str):
+                authors = [authors]
+            members.append(
+                {
+                    "name": member["name"],
+                    "authors": authors,
+                    "author_patterns": member.get("author_patterns", []),
+                    "build_dir": member.get("build_dir"),
+                }
+            )
+        return members
+
+    def get_use_mailmap(self):
+        return self.config.get("use_mailmap", True)
 
     def get_repositories(self):
-        return self.config.get("repository", [])
+        """Return the local path, or the remote URL, of each configured repository."""
+        return [
+            _get_repository_key(repo) if isinstance(repo, dict) else repo
+            for repo in self.config.get("repository", [])
+        ]
+
+    def get_repository_setting(self, repo_path, key, default=None):
+        """Return a setting from the repository's entry, falling back to the top-level setting."""
+        for repo in self.config.get("repository", []):
+            if isinstance(repo, dict) and _get_repository_key(repo) == repo_path and key in repo:
+                return repo[key]
+        return self.config.get(key, default)
+
+    def get_collection_mode(self):
+        return self.config.get("collection_mode", "batch")
+
+    def get_max_workers(self):
+        max_workers = self.config.get("max_workers")
+        return 4 if max_workers is None else max(1, max_workers)
+
+    def get_tokenizer_threads(self):
+        tokenizer_threads = self.config.get("tokenizer_threads")
+        return 8 if tokenizer_threads is None else max(1, tokenizer_threads)
+
+    def get_incremental_collection(self):
+        return self.config.get("incremental_collection", True)
+
+    def get_cache_max_size_mb(self):
+        cache_max_size_mb = self.config.get("cache_max_size_mb")
+        return 256 if cache_max_size_mb is None else cache_max_size_mb
 
     def get_max_diff_lines(self):
         return self.config.get("max_diff_lines", 25)
 
+    def get_diff_condensation(self):
+        return self.config.get("diff_condensation", False)
+
+    def get_diff_deduplication(self):
+        return self.config.get("diff_deduplication", True)
+
+    def get_token_budget(self):
+        return self.config.get("token_budget")
+
+    def get_activity_breakdowns(self):
+        return self.config.get("activity_breakdowns", ["weekly", "daily", "directories"])
+
+    def get_directory_depth(self):
+        directory_depth = self.config.get("directory_depth")
+        return 1 if directory_depth is None else max(1, directory_depth)
+
+    def get_breakdown_limit(self):
+        breakdown_limit = self.config.get("breakdown_limit")
+        return 10 if breakdown_limit is None else max(1, breakdown_limit)
+
     def get_lang(self):
         return self.config.get("lang", "ko")
 
     def get_report_history_limit(self):
         return self.config.get("report_history_limit", 10)
 
+    def get_max_report_tokens(self):
+        return self.config.get("max_report_tokens", 8000)
+
+    def get_max_report_size_kb(self):
+        return self.config.get("max_report_size_kb", 64)
+
+    def get_max_memo_tokens(self):
+        return self.config.get("max_memo_tokens", 16000)
+
+    def get_max_memo_size_kb(self):
+        return self.config.get("max_memo_size_kb", 128)
+
     def get_template(self):
         return self.template
+
+
+def _get_repository_key(repo):
+    return repo["url"] if "url" in repo else repo["path"]
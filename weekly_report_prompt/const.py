@@ -1,2 +1,8 @@
+import os
+from pathlib import Path
+
+# Reports, prompts, caches and profiles are written here, next to the package
+DEFAULT_BUILD_DIR = os.path.join(Path(__file__).parent.parent, "build")
+
 REPORT_BLANK_MESSAGE = "[//]: # (Paste the report generated by the LLM here and make final edits as needed)"
 MEMO_BLANK_MESSAGE = "[//]: # (Please write any notes in free format that can be used for weekly report prompt generation.)"
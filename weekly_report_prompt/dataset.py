@@ -0,0 +1,203 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, IO, Iterable, List, NamedTuple, Optional
+
+from file_modes import set_default_mode
+from schemas import CommitData, CommitDataSummary, CommitRecord
+
+DATASET_VERSION = 1
+# Export format -> file suffix
+DATASET_FORMATS = {
+    # One JSON record per line, written as each repository comes in
+    "jsonl": ".jsonl",
+    # One array per commit field, gzip-compressed; suits loading into data frames
+    "columnar": ".columns.json.gz",
+}
+COMMIT_COLUMNS = [
+    "id",
+    "author",
+    "email",
+    "date",
+    "message",
+    "insertions",
+    "deletions",
+    "files",
+    "per_file",
+    "diff",
+    "diff_total_lines",
+    "patch_id",
+]
+
+
+class Dataset(NamedTuple):
+    """The activity a prompt was generated from: one member's commits and summary per repository."""
+
+    member: Optional[str]
+    since_date: datetime
+    # Same shape as the project data given to PromptGenerator
+    project_data: List[Dict[str, Any]]
+
+
+def write_dataset(
+    path: str,
+    project_data: Iterable[Dict[str, Any]],
+    member: Optional[str],
+    since_date: datetime,
+    dataset_format: str = "jsonl",
+):
+    """Write the member's project data atomically, in one of DATASET_FORMATS, with commits in the CommitData schema."""
+    header = {
+        "type": "dataset",
+        "version": DATASET_VERSION,
+        "member": member,
+        "since_date": since_date.isoformat(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=".dataset-", suffix=".tmp"
+    )
+    try:
+        if dataset_format == "columnar":
+            with gzip.open(os.fdopen(fd, "wb"), "wt", encoding="utf-8") as f:
+                json.dump(_to_columns(header, project_data), f)
+        else:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                _write_jsonl(f, header, project_data)
+        set_default_mode(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def read_dataset(path: str) -> Dataset:
+    """Read a dataset written by write_dataset, in the format given by its file suffix, validating each commit."""
+    if path.endswith(DATASET_FORMATS["columnar"]):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return _from_columns(json.load(f))
+    with open(path, encoding="utf-8") as f:
+        return _read_jsonl(f)
+
+
+def _write_jsonl(f: IO[str], header: Dict[str, Any], project_data: Iterable[Dict[str, Any]]):
+    """Write the header, then each project followed by its commits and summary, one record per line."""
+    f.write(json.dumps(header) + "\n")
+    for project in project_data:
+        repo_path = project["repo_path"]
+        f.write(
+            json.dumps(
+                {
+                    "type": "project",
+                    "project_name": project["project_name"],
+                    "repo_path": repo_path,
+                    "head_commit": project["head_commit"],
+                }
+            )
+            + "\n"
+        )
+        for commit in project["recent_commits"]:
+            f.write(
+                json.dumps(
+                    {
+                        "type": "commit",
+                        "repo_path": repo_path,
+                        **commit.to_commit_data().model_dump(mode="json"),
+                    }
+                )
+                + "\n"
+            )
+        f.write(
+            json.dumps(
+                {
+                    "type": "summary",
+                    "repo_path": repo_path,
+                    **project["summary"].model_dump(mode="json"),
+                }
+            )
+            + "\n"
+        )
+
+
+def _read_jsonl(f: IO[str]) -> Dataset:
+    header = _check_header(json.loads(f.readline() or "{}"))
+    projects: Dict[str, Dict[str, Any]] = {}
+    for line in f:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        record_type = record.pop("type")
+        if record_type == "project":
+            projects[record["repo_path"]] = {**record, "recent_commits": [], "summary": None}
+        elif record_type == "commit":
+            projects[record.pop("repo_path")]["recent_commits"].append(
+                CommitRecord.from_commit_data(CommitData.model_validate(record))
+            )
+        elif record_type == "summary":
+            projects[record.pop("repo_path")]["summary"] = CommitDataSummary.model_validate(record)
+    return Dataset(
+        header["member"], datetime.fromisoformat(header["since_date"]), list(projects.values())
+    )
+
+
+def _to_columns(header: Dict[str, Any], project_data: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    projects = []
+    commits: Dict[str, List[Any]] = {column: [] for column in ["repo_path", *COMMIT_COLUMNS]}
+    for project in project_data:
+        projects.append(
+            {
+                "project_name": project["project_name"],
+                "repo_path": project["repo_path"],
+                "head_commit": project["head_commit"],
+                "summary": project["summary"].model_dump(mode="json"),
+            }
+        )
+        for commit in project["recent_commits"]:
+            data = commit.to_commit_data().model_dump(mode="json")
+            data.update(data.pop("stats"))
+            data["repo_path"] = project["repo_path"]
+            for column, values in commits.items():
+                values.append(data[column])
+    return {"dataset": header, "projects": projects, "commits": commits}
+
+
+def _from_columns(data: Dict[str, Any]) -> Dataset:
+    header = _check_header(data["dataset"])
+    projects = {
+        project["repo_path"]: {
+            "project_name": project["project_name"],
+            "repo_path": project["repo_path"],
+            "head_commit": project["head_commit"],
+            "recent_commits": [],
+            "summary": CommitDataSummary.model_validate(project["summary"]),
+        }
+        for project in data["projects"]
+    }
+    columns = data["commits"]
+    for row in zip(*(columns[column] for column in ["repo_path", *COMMIT_COLUMNS])):
+        values = dict(zip(["repo_path", *COMMIT_COLUMNS], row))
+        values["stats"] = {
+            "insertions": values.pop("insertions"),
+            "deletions": values.pop("deletions"),
+            "files": values.pop("files"),
+            "per_file": values.pop("per_file"),
+        }
+        repo_path = values.pop("repo_path")
+        projects[repo_path]["recent_commits"].append(
+            CommitRecord.from_commit_data(CommitData.model_validate(values))
+        )
+    return Dataset(
+        header["member"], datetime.fromisoformat(header["since_date"]), list(projects.values())
+    )
+
+
+def _check_header(header: Dict[str, Any]) -> Dict[str, Any]:
+    if header.get("type") != "dataset":
+        raise ValueError("Not a dataset file: the first record is not a dataset header")
+    if header.get("version") != DATASET_VERSION:
+        raise ValueError(
+            f"Unsupported dataset version {header.get('version')} (expected {DATASET_VERSION})"
+        )
+    return header
@@ -0,0 +1,275 @@
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# Unchanged lines kept on each side of a change
+CONTEXT_LINES = 1
+# Smallest slice of a file's hunks handed out per round, so every file gets a readable excerpt
+MIN_SLICE_LINES = 6
+# Files listed individually in the index of omitted changes
+MAX_INDEX_FILES = 20
+# Header lines that carry no information once the file path is known
+_SKIPPED_HEADER_PREFIXES = ("index ", "--- ", "+++ ", "similarity index ", "dissimilarity index ")
+
+
+class FileDiff:
+    """The patch of a single file: its `diff --git` line, extended headers and hunks."""
+
+    def __init__(self, header: str):
+        self.header = header
+        # "diff --git a/old b/new"
+        self.path = header.rsplit(" b/", 1)[-1] if " b/" in header else header
+        self.extended_headers: List[str] = []
+        self.hunks: List[List[str]] = []
+        self.is_binary = False
+
+    @property
+    def kept_headers(self) -> List[str]:
+        """The `diff --git` line and the extended headers worth showing, such as renames and modes."""
+        return [self.header] + [
+            line
+            for line in self.extended_headers
+            if not line.startswith(_SKIPPED_HEADER_PREFIXES)
+        ]
+
+    def count_changes(self) -> Tuple[int, int]:
+        insertions = sum(
+            1 for hunk in self.hunks for line in hunk[1:] if line.startswith("+")
+        )
+        deletions = sum(
+            1 for hunk in self.hunks for line in hunk[1:] if line.startswith("-")
+        )
+        return insertions, deletions
+
+
+class CondensedDiff(NamedTuple):
+    lines: List[str]
+    # Diff lines among `lines`, excluding the index of omitted changes
+    diff_lines: int
+    omitted: bool
+
+
+def parse_diff(diff: str) -> List[FileDiff]:
+    """Split a unified git diff into files and hunks; each hunk starts with its `@@` line."""
+    files: List[FileDiff] = []
+    current: Optional[FileDiff] = None
+    for line in diff.splitlines():
+        if line.startswith("diff --git "):
+            current = FileDiff(line)
+            files.append(current)
+        elif current is None:
+            continue
+        elif line.startswith("@@"):
+            current.hunks.append([line])
+        elif current.hunks:
+            current.hunks[-1].append(line)
+        elif line.startswith("Binary files "):
+            current.is_binary = True
+        else:
+            current.extended_headers.append(line)
+    return files
+
+
+def is_whitespace_only(hunk: Sequence[str]) -> bool:
+    """Return whether the hunk's removed and added lines differ only in whitespace."""
+    removed = "".join(line[1:] for line in hunk[1:] if line.startswith("-"))
+    added = "".join(line[1:] for line in hunk[1:] if line.startswith("+"))
+    return "".join(removed.split()) == "".join(added.split())
+
+
+def collapse_context(hunk: Sequence[str], context_lines: int = CONTEXT_LINES) -> List[str]:
+    """Keep the changed lines and `context_lines` unchanged lines around them."""
+    body = hunk[1:]
+    changed = [index for index, line in enumerate(body) if line[:1] in ("+", "-")]
+    keep = set()
+    for index in changed:
+        keep.update(range(index - context_lines, index + context_lines + 1))
+    # "\ No newline at end of file" belongs to the line before it
+    keep.update(index for index, line in enumerate(body) if line.startswith("\\"))
+
+    collapsed = [hunk[0]]
+    previous = None
+    for index, line in enumerate(body):
+        if index not in keep:
+            continue
+        if previous is not None and index > previous + 1:
+            collapsed.append(" ...")
+        collapsed.append(line)
+        previous = index
+    return collapsed
+
+
+def condense_diff(
+    diff: str,
+    max_lines: int,
+    per_file: Optional[Sequence[Tuple[str, int, int]]] = None,
+) -> CondensedDiff:
+    """Condense a diff into about `max_lines` lines, sampling hunks across all changed files.
+
+    Whitespace-only hunks and files without hunks (renames, mode changes) are only listed in the index,
+    and unchanged lines are collapsed. The remaining hunks are handed out round-robin, a slice per file
+    per round, so every file gets an excerpt before any file gets more. Anything left out is listed with
+    its +N/-M line counts, taken from `per_file` when given, since the diff itself may already have been
+    cut short by the collector.
+    """
+    files = parse_diff(diff)
+    file_stats: Dict[str, Tuple[int, int]] = {
+        path: (insertions, deletions) for path, insertions, deletions in per_file or []
+    }
+
+    notes: Dict[str, str] = {}
+    candidates: List[Tuple[FileDiff, List[List[str]]]] = []
+    for file_diff in files:
+        if file_diff.is_binary:
+            notes[file_diff.path] = "binary"
+            continue
+        hunks = [hunk for hunk in file_diff.hunks if not is_whitespace_only(hunk)]
+        if not file_diff.hunks:
+            # Renames, mode changes and empty files have no hunks; so do files the collector stopped reading
+            if any(file_stats.get(file_diff.path, (0, 0))):
+                notes[file_diff.path] = "omitted"
+            else:
+                notes[file_diff.path] = _describe_headers(file_diff)
+            continue
+        if not hunks:
+            notes[file_diff.path] = "whitespace only"
+            continue
+        if len(hunks) < len(file_diff.hunks):
+            notes[file_diff.path] = "whitespace-only hunks"
+        candidates.append((file_diff, [collapse_context(hunk) for hunk in hunks]))
+
+    file_hunks = [hunks for _, hunks in candidates]
+    header_costs = [len(file_diff.kept_headers) for file_diff, _ in candidates]
+    # The index takes lines too, so hand out the hunks again with room left for it until it fits.
+    # Less room only truncates more files, so the index grows until it stops changing.
+    index_lines = 0
+    while True:
+        taken = _allocate_slices(file_hunks, header_costs, max(0, max_lines - index_lines))
+        index = _build_index(files, candidates, taken, notes, file_stats, max_lines)
+        if len(index) <= index_lines:
+            break
+        index_lines = len(index)
+
+    output: List[str] = []
+    for (file_diff, hunks), count in zip(candidates, taken):
+        if count == 0:
+            continue
+        output.extend(file_diff.kept_headers)
+        output.extend([line for hunk in hunks for line in hunk][:count])
+    diff_lines = len(output)
+    return CondensedDiff(output + index, diff_lines, bool(index))
+
+
+def _describe_headers(file_diff: FileDiff) -> str:
+    """Describe a file diff without hunks by its extended headers."""
+    headers = {}
+    for line in file_diff.extended_headers:
+        for prefix in ("rename from ", "old mode ", "new mode ", "new file mode ", "deleted file mode "):
+            if line.startswith(prefix):
+                headers[prefix.strip()] = line[len(prefix):]
+    descriptions = []
+    if "rename from" in headers:
+        descriptions.append(f"renamed from {headers['rename from']}")
+    if "old mode" in headers and "new mode" in headers:
+        descriptions.append(f"mode {headers['old mode']} -> {headers['new mode']}")
+    if "new file mode" in headers:
+        descriptions.append("new empty file")
+    if "deleted file mode" in headers:
+        descriptions.append("deleted empty file")
+    return ", ".join(descriptions) or "no content changes"
+
+
+def _allocate_slices(
+    file_hunks: List[List[List[str]]], header_costs: List[int], budget: int
+) -> List[int]:
+    """Decide how many leading lines of each file's hunks fit into the budget.
+
+    Each round gives every file its next hunk, or the next slice of a hunk too long for one round.
+    A hunk that does not fit is only cut if a useful part of it still fits. Whatever is left once no
+    such part fits is given to the files in order, so the budget is used up.
+    """
+    taken = [0] * len(file_hunks)
+    if not file_hunks:
+        return taken
+    # Line offsets where each file's hunks end
+    hunk_ends = []
+    for hunks in file_hunks:
+        ends, end = [], 0
+        for hunk in hunks:
+            end += len(hunk)
+            ends.append(end)
+        hunk_ends.append(ends)
+
+    slice_lines = max(MIN_SLICE_LINES, budget // len(file_hunks))
+    remaining = budget
+    progress = True
+    while progress and remaining > 0:
+        progress = False
+        for index, ends in enumerate(hunk_ends):
+            if taken[index] >= ends[-1]:
+                continue
+            rest = next(end for end in ends if end > taken[index]) - taken[index]
+            # The file's headers are paid for with its first slice
+            header_cost = header_costs[index] if taken[index] == 0 else 0
+            count = min(rest, slice_lines)
+            if count + header_cost > remaining:
+                count = remaining - header_cost
+                if count < min(rest, MIN_SLICE_LINES):
+                    continue
+            taken[index] += count
+            remaining -= count + header_cost
+            progress = True
+
+    for index, ends in enumerate(hunk_ends):
+        header_cost = header_costs[index] if taken[index] == 0 else 0
+        count = min(ends[-1] - taken[index], remaining - header_cost)
+        # A cut right after a hunk's @@ line would show nothing of the hunk
+        last_line = taken[index] + count - 1
+        if count > 0 and (last_line == 0 or last_line in ends):
+            count -= 1
+        if count <= 0:
+            continue
+        taken[index] += count
+        remaining -= count + header_cost
+    return taken
+
+
+def _build_index(files, candidates, taken, notes, file_stats, max_lines) -> List[str]:
+    """List the files whose changes were left out, in whole or in part, in `max_lines` lines where possible."""
+    entries = []
+    candidate_lines = {
+        file_diff.path: (sum(len(hunk) for hunk in hunks), count)
+        for (file_diff, hunks), count in zip(candidates, taken)
+    }
+    for file_diff in files:
+        path = file_diff.path
+        note = notes.get(path)
+        if path in candidate_lines:
+            line_count, count = candidate_lines[path]
+            if count == 0:
+                note = "omitted"
+            elif count < line_count:
+                note = "truncated"
+            # Cut short by the collector, so the stats hold changes not present here
+            elif path in file_stats and file_stats[path] != file_diff.count_changes():
+                note = "truncated"
+        if note is None:
+            continue
+        insertions, deletions = file_stats.get(path) or file_diff.count_changes()
+        entries.append((path, insertions, deletions, note))
+
+    if not entries:
+        return []
+    # Below the title, either every entry or as many as fit above a line summing up the rest
+    if len(entries) <= min(MAX_INDEX_FILES, max_lines - 1):
+        listed = len(entries)
+    else:
+        listed = max(0, min(MAX_INDEX_FILES, max_lines - 2))
+    index = ["# Omitted changes (+added/-deleted lines):"]
+    for path, insertions, deletions, note in entries[:listed]:
+        index.append(f"#   {path} +{insertions}/-{deletions} ({note})")
+    if len(entries) > listed:
+        rest = entries[listed:]
+        index.append(
+            f"#   ... and {len(rest)} more files "
+            f"+{sum(entry[1] for entry in rest)}/-{sum(entry[2] for entry in rest)}"
+        )
+    return index
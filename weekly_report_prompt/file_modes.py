@@ -0,0 +1,16 @@
+import os
+
+
+def _read_umask() -> int:
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Read once, since reading the umask means setting it, which is not safe while other threads create files
+UMASK = _read_umask()
+
+
+def set_default_mode(path: str):
+    """Give a file created by tempfile.mkstemp, which is private (0600), the mode open() would have given it."""
+    os.chmod(path, 0o666 & ~UMASK)
@@ -1,42 +1,579 @@
+import dataclasses
 import git
 from datetime import datetime
-from typing import List
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
-from schemas import CommitData
+from authors import build_author_patterns
+from schemas import CommitRecord, StatsRecord
 from config_loader import ConfigLoader
+from commit_cache import CommitCache
+from patch_id import PatchIdHasher
+from profiler import profiler
+
+# Every commit in the batched log stream starts with a record separator, followed by
+# NUL-terminated header fields. A numstat or patch line can never start with \x1e.
+LOG_RECORD_SEPARATOR = "\x1e"
+LOG_RECORD_SEPARATOR_BYTES = LOG_RECORD_SEPARATOR.encode()
+LOG_FORMAT = "%x1e%H%x00%an%x00%ae%x00%cI%x00%B%x00"
+# Same fields, with author identities mapped through .mailmap
+LOG_FORMAT_MAILMAP = "%x1e%H%x00%aN%x00%aE%x00%cI%x00%B%x00"
+LOG_HEADER_FIELDS = 5
+# Commit and author identity of each selected commit, for per_commit collection
+AUTHOR_FORMAT = "%H%x00%an%x00%ae"
+AUTHOR_FORMAT_MAILMAP = "%H%x00%aN%x00%aE"
+EMPTY_TREE_SHA = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+# Number of commit SHAs passed to a single `git log --no-walk` invocation
+LOG_BATCH_SIZE = 500
+# With diff condensation, the collector keeps up to this many times `max_diff_lines` lines of a commit's
+# diff, and twice `max_diff_lines` of each file, so the condenser can sample hunks from every file
+CONDENSED_DIFF_RETENTION = 10
+CONDENSED_FILE_DIFF_RETENTION = 2
+# Bump when the shape of collected CommitData changes, to invalidate cached commits
+CACHE_FORMAT_VERSION = 6
+# Excluded by `skip_generated_files`, in addition to files marked `linguist-generated` in .gitattributes
+GENERATED_FILE_PATTERNS = [
+    "**/*.lock",
+    "**/package-lock.json",
+    "**/pnpm-lock.yaml",
+    "**/go.sum",
+    "**/*.min.js",
+    "**/*.min.css",
+    "**/*.map",
+    "**/*.snap",
+    "**/__snapshots__/**",
+    "**/*_pb2.py",
+    "**/*.pb.go",
+]
+# Extended header lines that may precede the "Binary files ... differ" line of a file diff
+DIFF_EXTENDED_HEADER_PREFIXES = (
+    b"old mode ",
+    b"new mode ",
+    b"deleted file mode ",
+    b"new file mode ",
+    b"copy from ",
+    b"copy to ",
+    b"rename from ",
+    b"rename to ",
+    b"similarity index ",
+    b"dissimilarity index ",
+    b"index ",
+)
 
 
 class GitDataCollector:
-    def __init__(self, config_loader: ConfigLoader, repo_path: str = "."):
+    def __init__(
+        self,
+        config_loader: ConfigLoader,
+        repo_path: str = ".",
+        commit_cache: Optional[CommitCache] = None,
+        author_patterns: Optional[List[str]] = None,
+        git_dir: Optional[str] = None,
+    ):
+        """
+        Args:
+            repo_path: The repository's entry in the configuration, which its settings are looked up by
+            git_dir: The repository to read, if not at `repo_path`, e.g. the mirror of a remote repository
+        """
         self.config_loader = config_loader
-        self.author = config_loader.get_author()
-        self.repo = git.Repo(repo_path)
+        if author_patterns is None:
+            author_patterns = build_author_patterns(
+                authors=config_loader.get_authors(),
+                author_patterns=config_loader.get_author_patterns(),
+            )
+        self.author_patterns = author_patterns
+        self.use_mailmap = config_loader.get_use_mailmap()
+        self.collection_mode = config_loader.get_collection_mode()
+        # Diffs are truncated while they are read, so a huge patch never lands in memory
+        self.max_diff_lines = config_loader.get_max_diff_lines()
+        self.diff_condensation = config_loader.get_diff_condensation()
+        self.pathspecs = build_pathspecs(
+            include_paths=config_loader.get_repository_setting(
+                repo_path, "include_paths", []
+            ),
+            exclude_paths=config_loader.get_repository_setting(
+                repo_path, "exclude_paths", []
+            ),
+            skip_generated_files=config_loader.get_repository_setting(
+                repo_path, "skip_generated_files", False
+            ),
+        )
+        self.skip_binary_files = config_loader.get_repository_setting(
+            repo_path, "skip_binary_files", False
+        )
+        self.filter_stats = config_loader.get_repository_setting(
+            repo_path, "filter_stats", False
+        )
+        self.repo = git.Repo(git_dir or repo_path)
+        self.commit_cache = commit_cache
+
+    @property
+    def has_path_filters(self) -> bool:
+        return bool(self.pathspecs) or self.skip_binary_files
+
+    @property
+    def cache_fingerprint(self) -> str:
+        """Settings that affect the content of a collected commit."""
+        filters = "|".join(self.pathspecs)
+        return (
+            f"v{CACHE_FORMAT_VERSION}:{self.collection_mode}:{self.max_diff_lines}:"
+            f"{filters}:{self.skip_binary_files}:{self.filter_stats}:{self.use_mailmap}:"
+            f"{self.diff_condensation}"
+        )
 
     def collect_commits(
         self,
         since_date: datetime,
-    ) -> List[CommitData]:
-        """Collect commits since the given date, excluding merge commits and those not matching the configured author."""
-        commits = []
-        for commit in self.repo.iter_commits(since=since_date):
-            # Exclude merge commits
-            if len(commit.parents) > 1:
-                continue
-            # Exclude commits not matching the author
-            if commit.author.name != self.author:
-                continue
+        since_commit: Optional[str] = None,
+        until_commit: str = "HEAD",
+        exclude_ids: Optional[Set[str]] = None,
+    ) -> List[CommitRecord]:
+        """Collect commits since the given date, excluding merge commits and those not matching the configured author.
 
-            commit_data = CommitData.from_commit(
-                commit, self.get_commit_diff(commit.hexsha)
-            )
+        If `since_commit` is given and still exists, only the commits in `since_commit..until_commit` are collected
+        instead of scanning by date. Commits in `exclude_ids` (e.g. already reported ones) are skipped.
+        """
+        if since_commit is not None and self.has_commit(since_commit):
+            revisions = {"args": [f"{since_commit}..{until_commit}"], "kwargs": {}}
+        else:
+            revisions = {"args": [until_commit], "kwargs": {"since": since_date}}
+        # Merge and author filtering happen inside git, so other commits are never read
+        revisions["kwargs"].update(self._commit_filter_options())
+        exclude_ids = exclude_ids or set()
+
+        if self.collection_mode == "per_commit":
+            return self._collect_commits_per_commit(revisions, exclude_ids)
+        return self._collect_commits_batched(revisions, exclude_ids)
+
+    def _commit_filter_options(self) -> Dict[str, Any]:
+        """Return the `git log` options selecting the author's non-merge commits."""
+        options: Dict[str, Any] = {"no_merges": True}
+        if self.author_patterns:
+            # Several --author options match commits by any of them
+            options["author"] = self.author_patterns
+            options["extended_regexp"] = True
+        if self.use_mailmap:
+            options["use_mailmap"] = True
+        else:
+            options["no_use_mailmap"] = True
+        return options
+
+    def get_head_commit(self) -> str:
+        """Return the SHA of the commit currently checked out."""
+        return self.repo.head.commit.hexsha
+
+    def has_commit(self, commit_id: str) -> bool:
+        try:
+            self.repo.git.cat_file("-e", f"{commit_id}^{{commit}}")
+        except git.GitCommandError:
+            return False
+        return True
+
+    def get_merge_base(self, commit_ids: List[str]) -> Optional[str]:
+        """Return the best common ancestor of the commits, or None if there is none."""
+        try:
+            return self.repo.git.merge_base("--octopus", *commit_ids) or None
+        except git.GitCommandError:
+            return None
+
+    def list_range_commit_ids(self, since_commit: str, until_commit: str) -> Set[str]:
+        """Return the IDs of all commits in `since_commit..until_commit`, whoever wrote them."""
+        return set(self.repo.git.rev_list(f"{since_commit}..{until_commit}").splitlines())
+
+    def _collect_commits_per_commit(
+        self, revisions: Dict[str, Any], exclude_ids: Set[str]
+    ) -> List[CommitRecord]:
+        """Collect commits with separate git calls for each commit's stats and diff."""
+        # GitPython's commits carry the raw author, while git selected them by the mailmapped one
+        authors = {
+            commit_id: (name, email)
+            for commit_id, name, email in self._list_commit_authors(revisions)
+            if commit_id not in exclude_ids
+        }
+        candidates = [self.repo.commit(commit_id) for commit_id in authors]
+
+        cached = self._get_cached_commits([commit.hexsha for commit in candidates])
+        commits = []
+        fetched = []
+        for commit in candidates:
+            commit_data = cached.get(commit.hexsha)
+            if commit_data is None:
+                diff_buffer = self._read_commit_diff(commit.hexsha)
+                stats = (
+                    self.get_commit_stats(commit.hexsha) if self.filter_stats else None
+                )
+                commit_data = CommitRecord.from_commit(
+                    commit,
+                    diff_buffer.getvalue(),
+                    diff_buffer.total_lines,
+                    stats,
+                    diff_buffer.patch_id_hasher.hexdigest(),
+                    author=authors[commit.hexsha],
+                )
+                fetched.append(commit_data)
             commits.append(commit_data)
 
+        self._put_cached_commits(fetched)
+        return commits
+
+    def _collect_commits_batched(
+        self, revisions: Dict[str, Any], exclude_ids: Set[str]
+    ) -> List[CommitRecord]:
+        """Collect metadata, numstat and patches for the whole range from a single `git log` stream."""
+        if self.commit_cache is None:
+            return [
+                commit_data
+                for commit_data in self._fetch_commits(
+                    *revisions["args"], **revisions["kwargs"]
+                )
+                if commit_data.id not in exclude_ids
+            ]
+
+        # List the matching commits cheaply, then stream only the ones missing from the cache
+        commit_ids = [
+            commit_id
+            for commit_id in self._list_commit_ids(revisions)
+            if commit_id not in exclude_ids
+        ]
+        cached = self._get_cached_commits(commit_ids)
+        missing_ids = [commit_id for commit_id in commit_ids if commit_id not in cached]
+        fetched = {}
+        for start in range(0, len(missing_ids), LOG_BATCH_SIZE):
+            for commit_data in self._fetch_commits(
+                *missing_ids[start : start + LOG_BATCH_SIZE], no_walk="unsorted"
+            ):
+                fetched[commit_data.id] = commit_data
+
+        self._put_cached_commits(fetched.values())
+        return [cached.get(commit_id) or fetched[commit_id] for commit_id in commit_ids]
+
+    def _fetch_commits(self, *args, **kwargs) -> List[CommitRecord]:
+        """Read the commits in the given revision range, applying the path filters to their diffs."""
+        if not self.has_path_filters:
+            return list(self._read_log_stream(*args, **kwargs))
+
+        # A pathspec also hides commits that only touch excluded paths, so commits are selected
+        # without it and only the patches (and optionally the stats) are read through it.
+        commits = list(self._read_log_stream(*args, patch=False, **kwargs))
+        filtered = {
+            commit_data.id: commit_data
+            for commit_data in self._read_log_stream(
+                *args,
+                "--",
+                *self.pathspecs,
+                skip_binary_files=self.skip_binary_files,
+                **kwargs,
+            )
+        }
+        for index, commit_data in enumerate(commits):
+            filtered_data = filtered.get(commit_data.id)
+            update = {
+                "diff": filtered_data.diff if filtered_data else "",
+                "diff_total_lines": filtered_data.diff_total_lines if filtered_data else 0,
+                "patch_id": filtered_data.patch_id if filtered_data else "",
+            }
+            if self.filter_stats:
+                update["stats"] = (
+                    filtered_data.stats
+                    if filtered_data
+                    else StatsRecord(insertions=0, deletions=0, files=0)
+                )
+            commits[index] = dataclasses.replace(commit_data, **update)
         return commits
 
-    def get_commit_diff(self, commit_id: str) -> str:
-        """Return the diff information for a specific commit."""
+    def _list_commit_ids(self, revisions: Dict[str, Any]) -> List[str]:
+        """Return the IDs of the selected commits in the revision range, newest first."""
+        with profiler.stage("git log (commit IDs)"):
+            output = self.repo.git.log(
+                *revisions["args"], format="%H", **revisions["kwargs"]
+            )
+        return output.splitlines()
+
+    def _list_commit_authors(self, revisions: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+        """Return the ID, author name and email of the selected commits, newest first."""
+        with profiler.stage("git log (commit IDs)"):
+            output = self.repo.git.log(
+                *revisions["args"],
+                format=AUTHOR_FORMAT_MAILMAP if self.use_mailmap else AUTHOR_FORMAT,
+                **revisions["kwargs"],
+            )
+        return [tuple(line.split("\x00")) for line in output.splitlines()]
+
+    def _read_log_stream(
+        self, *args, patch: bool = True, skip_binary_files: bool = False, **kwargs
+    ) -> Iterator[CommitRecord]:
+        """Run `git log` with numstat and patches and parse its output as it streams in.
+
+        Stats are counted without rename detection, like GitPython's `Commit.stats`. The patches keep
+        showing renames, so the few commits with a renamed file have their stats read again.
+        """
+        if not patch:
+            kwargs["no_renames"] = True
+        with profiler.stage("git log stream"):
+            process = self.repo.git.log(
+                *args,
+                no_color=True,
+                format=LOG_FORMAT_MAILMAP if self.use_mailmap else LOG_FORMAT,
+                numstat=True,
+                p=patch,
+                as_process=True,
+                **kwargs,
+            )
+            for commit_data in parse_log_stream(
+                process.stdout,
+                skip_binary_files=skip_binary_files,
+                renamed_stats=self.get_commit_stats if patch else None,
+                **self._diff_limits(),
+            ):
+                profiler.count("commits read from git log")
+                profiler.count("diff lines read", commit_data.diff_total_lines)
+                yield commit_data
+            # Raises GitCommandError if git exited with an error
+            process.wait()
+
+    def _diff_limits(self) -> Dict[str, Optional[int]]:
+        """Return how much of each diff to keep while reading it."""
+        if not self.diff_condensation or self.max_diff_lines is None:
+            return {"max_lines": self.max_diff_lines}
+        return {
+            "max_lines": self.max_diff_lines * CONDENSED_DIFF_RETENTION,
+            "max_file_lines": self.max_diff_lines * CONDENSED_FILE_DIFF_RETENTION,
+        }
+
+    def _get_cached_commits(self, commit_ids: List[str]) -> Dict[str, CommitRecord]:
+        if self.commit_cache is None or not commit_ids:
+            return {}
+        with profiler.stage("commit cache"):
+            cached = self.commit_cache.get_many(commit_ids, self.cache_fingerprint)
+        profiler.count("commit cache hits", len(cached))
+        return cached
+
+    def _put_cached_commits(self, commits: Iterable[CommitRecord]):
+        if self.commit_cache is not None:
+            with profiler.stage("commit cache"):
+                self.commit_cache.put_many(commits, self.cache_fingerprint)
+
+    def _read_commit_diff(self, commit_id: str) -> "DiffBuffer":
+        """Read the diff of a specific commit, kept up to the configured limits, with its patch ID."""
+        with profiler.stage("git diff (per commit)"):
+            process = self.repo.git.diff(
+                *self._get_diff_range(commit_id), "--", *self.pathspecs, as_process=True
+            )
+            diff_buffer = DiffBuffer(
+                skip_binary_files=self.skip_binary_files, **self._diff_limits()
+            )
+            for raw_line in process.stdout:
+                diff_buffer.add(raw_line)
+            process.wait()
+        profiler.count("diff lines read", diff_buffer.total_lines)
+        return diff_buffer
+
+    def get_commit_stats(self, commit_id: str) -> StatsRecord:
+        """Return the stats of a specific commit, restricted to the configured path filters."""
+        with profiler.stage("git diff --numstat (per commit)"):
+            output = self.repo.git.diff(
+                *self._get_diff_range(commit_id),
+                "--",
+                *self.pathspecs,
+                numstat=True,
+                no_renames=True,
+            )
+        return parse_numstat(output.splitlines(), self.skip_binary_files)
+
+    def _get_diff_range(self, commit_id: str) -> Tuple[str, str]:
         commit = self.repo.commit(commit_id)
         if len(commit.parents) > 0:
-            return self.repo.git.diff(commit.parents[0], commit)
+            return commit.parents[0].hexsha, commit.hexsha
         else:
-            return self.repo.git.diff(git.NULL_TREE, commit)
+            # Root commits are diffed against the empty tree
+            return EMPTY_TREE_SHA, commit.hexsha
+
+
+def build_pathspecs(
+    include_paths: List[str], exclude_paths: List[str], skip_generated_files: bool
+) -> List[str]:
+    """Translate include/exclude globs into git pathspecs."""
+    pathspecs = [f":(glob){pattern}" for pattern in include_paths]
+    pathspecs += [f":(exclude,glob){pattern}" for pattern in exclude_paths]
+    if skip_generated_files:
+        pathspecs += [f":(exclude,glob){pattern}" for pattern in GENERATED_FILE_PATTERNS]
+        # A bare `linguist-generated` sets the attribute; the `=true` GitHub documents gives it a value
+        pathspecs.append(":(exclude,attr:linguist-generated)")
+        pathspecs.append(":(exclude,attr:linguist-generated=true)")
+    return pathspecs
+
+
+class DiffBuffer:
+    """Accumulate a diff line by line, keeping only the first `max_lines` lines and counting the rest.
+
+    With `max_file_lines`, at most that many lines of each file are kept, and every file's
+    `diff --git` line is kept even past `max_lines`, so all changed files stay visible.
+    """
+
+    def __init__(
+        self,
+        max_lines: Optional[int] = None,
+        skip_binary_files: bool = False,
+        max_file_lines: Optional[int] = None,
+    ):
+        self.max_lines = max_lines
+        self.skip_binary_files = skip_binary_files
+        self.max_file_lines = max_file_lines
+        self.lines: List[str] = []
+        self.total_lines = 0
+        # Hashes every line, including those not kept
+        self.patch_id_hasher = PatchIdHasher()
+        self._file_lines = 0
+        # Header lines of the current file diff, held back until we know it is not a binary file
+        self._pending: List[bytes] = []
+
+    def add(self, raw_line: bytes):
+        if self.skip_binary_files:
+            if raw_line.startswith(b"diff --git "):
+                self._flush_pending()
+                self._pending.append(raw_line)
+                return
+            if self._pending:
+                if raw_line.startswith(b"Binary files "):
+                    self._pending = []
+                    return
+                if raw_line.startswith(DIFF_EXTENDED_HEADER_PREFIXES):
+                    self._pending.append(raw_line)
+                    return
+                self._flush_pending()
+        self._append(raw_line)
+
+    def getvalue(self) -> str:
+        self._flush_pending()
+        # Match the output of `repo.git.diff`, which strips the trailing newline
+        return "".join(self.lines).rstrip("\n")
+
+    def _flush_pending(self):
+        for raw_line in self._pending:
+            self._append(raw_line)
+        self._pending = []
+
+    def _append(self, raw_line: bytes):
+        self.total_lines += 1
+        self.patch_id_hasher.update(raw_line)
+        if self.max_file_lines is not None:
+            if raw_line.startswith(b"diff --git "):
+                self._file_lines = 0
+                self.lines.append(_decode(raw_line))
+                return
+            if self._file_lines >= self.max_file_lines:
+                return
+            self._file_lines += 1
+        if self.max_lines is None or len(self.lines) < self.max_lines:
+            self.lines.append(_decode(raw_line))
+
+
+def parse_log_stream(
+    lines: Iterable[bytes],
+    max_lines: Optional[int] = None,
+    skip_binary_files: bool = False,
+    max_file_lines: Optional[int] = None,
+    renamed_stats: Optional[Callable[[str], StatsRecord]] = None,
+) -> Iterator[CommitRecord]:
+    """Parse the output of `git log --format=LOG_FORMAT --numstat -p` one commit at a time.
+
+    Only the lines of each patch kept by a DiffBuffer with these limits are decoded; the rest are just counted.
+    `renamed_stats`, if given, returns the stats of a commit whose numstat shows a renamed file.
+    """
+    header: Optional[str] = None
+    header_done = False
+    numstat_lines: List[str] = []
+    diff_buffer = DiffBuffer(max_lines, skip_binary_files, max_file_lines)
+    in_patch = False
+
+    for raw_line in lines:
+        if raw_line.startswith(LOG_RECORD_SEPARATOR_BYTES):
+            if header is not None:
+                yield _build_commit_data(
+                    header, numstat_lines, diff_buffer, skip_binary_files, renamed_stats
+                )
+            header = _decode(raw_line[len(LOG_RECORD_SEPARATOR_BYTES) :])
+            header_done = header.count("\x00") >= LOG_HEADER_FIELDS
+            numstat_lines = []
+            diff_buffer = DiffBuffer(max_lines, skip_binary_files, max_file_lines)
+            in_patch = False
+        elif header is None:
+            continue
+        elif not header_done:
+            # Commit messages span multiple lines
+            header += _decode(raw_line)
+            header_done = header.count("\x00") >= LOG_HEADER_FIELDS
+        elif in_patch or raw_line.startswith(b"diff --git "):
+            in_patch = True
+            diff_buffer.add(raw_line)
+        elif raw_line.strip():
+            numstat_lines.append(_decode(raw_line))
+
+    if header is not None:
+        yield _build_commit_data(
+            header, numstat_lines, diff_buffer, skip_binary_files, renamed_stats
+        )
+
+
+def _decode(raw_line: bytes) -> str:
+    return raw_line.decode("utf-8", errors="replace")
+
+
+def _build_commit_data(
+    header: str,
+    numstat_lines: List[str],
+    diff_buffer: DiffBuffer,
+    skip_binary_files: bool,
+    renamed_stats: Optional[Callable[[str], StatsRecord]] = None,
+) -> CommitRecord:
+    """Create a CommitRecord from one parsed record of the log stream."""
+    hexsha, author, email, date, message = header.split("\x00")[:LOG_HEADER_FIELDS]
+    if renamed_stats is not None and any(" => " in line for line in numstat_lines):
+        stats = renamed_stats(hexsha)
+    else:
+        stats = parse_numstat(numstat_lines, skip_binary_files)
+    return CommitRecord(
+        id=hexsha,
+        author=author,
+        email=email,
+        date=datetime.fromisoformat(date),
+        message=message.strip(),
+        stats=stats,
+        diff=diff_buffer.getvalue(),
+        diff_total_lines=diff_buffer.total_lines,
+        patch_id=diff_buffer.patch_id_hasher.hexdigest(),
+    )
+
+
+def parse_numstat(
+    numstat_lines: Iterable[str], skip_binary_files: bool = False
+) -> StatsRecord:
+    """Total `--numstat` lines the same way GitPython's `Commit.stats` does, keeping each file's counts."""
+    insertions = deletions = files = 0
+    per_file = []
+    for line in numstat_lines:
+        raw_insertions, raw_deletions, path = line.split("\t", 2)
+        if skip_binary_files and raw_insertions == "-":
+            continue
+        # Binary files are reported as "-"
+        file_insertions = int(raw_insertions) if raw_insertions != "-" else 0
+        file_deletions = int(raw_deletions) if raw_deletions != "-" else 0
+        insertions += file_insertions
+        deletions += file_deletions
+        files += 1
+        per_file.append((resolve_numstat_path(path.rstrip("\n")), file_insertions, file_deletions))
+    return StatsRecord(
+        insertions=insertions, deletions=deletions, files=files, per_file=per_file
+    )
+
+
+def resolve_numstat_path(path: str) -> str:
+    """Return the new path of a `--numstat` entry, which shows renames as "a => b" or "dir/{a => b}/file"."""
+    if " => " not in path:
+        return path
+    if "{" in path:
+        prefix, rest = path.split("{", 1)
+        renamed, suffix = rest.split("}", 1)
+        new_path = prefix + renamed.split(" => ", 1)[1] + suffix
+        # "dir/{ => sub}/file" leaves a doubled slash
+        return new_path.replace("//", "/")
+    return path.split(" => ", 1)[1]
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from file_modes import set_default_mode
+from schemas import HistoryEntry
+
+REPORT_FILENAME_PATTERN = re.compile(r"report-(\d{8}-\d{6})\.md")
+INDEX_FILENAME = "index.json"
+
+
+class HistoryIndex:
+    """Manifest of the reports in the history directory, stored next to them as index.json.
+
+    The newest reports can be found by date without opening the older ones. Only files that are new
+    or changed since the index was written are read, to hash them.
+    """
+
+    def __init__(self, history_dir: str):
+        self.history_dir = history_dir
+        self.index_path = os.path.join(history_dir, INDEX_FILENAME)
+        self.entries: Dict[str, HistoryEntry] = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for entry in json.load(f).get("reports", []):
+                    entry = HistoryEntry.model_validate(entry)
+                    self.entries[entry.filename] = entry
+        self._refreshed = False
+
+    def refresh(self):
+        """Bring the index in line with the files in the history directory."""
+        seen = set()
+        changed = False
+        with os.scandir(self.history_dir) as it:
+            for dir_entry in it:
+                filename = dir_entry.name
+                if not (filename.startswith("report-") and filename.endswith(".md")):
+                    continue
+                seen.add(filename)
+                stat = dir_entry.stat()
+                entry = self.entries.get(filename)
+                if entry and entry.size == stat.st_size and entry.mtime == stat.st_mtime:
+                    continue
+                with open(dir_entry.path, "rb") as f:
+                    content = f.read()
+                self.entries[filename] = self._make_entry(filename, content, stat)
+                changed = True
+        for filename in set(self.entries) - seen:
+            del self.entries[filename]
+            changed = True
+        if changed:
+            self.save()
+        self._refreshed = True
+
+    def add(self, filename: str, content: bytes):
+        """Record a report that was just moved into the history directory."""
+        stat = os.stat(os.path.join(self.history_dir, filename))
+        self.entries[filename] = self._make_entry(filename, content, stat)
+        self.save()
+
+    def latest(self, limit: Optional[int] = None) -> List[HistoryEntry]:
+        """Return the newest entries first."""
+        if not self._refreshed:
+            self.refresh()
+        entries = sorted(self.entries.values(), key=lambda entry: entry.date, reverse=True)
+        return entries[:limit] if limit is not None else entries
+
+    def save(self):
+        """Write the index atomically."""
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self.history_dir, prefix=".index-", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "reports": [
+                            entry.model_dump(mode="json")
+                            for entry in sorted(
+                                self.entries.values(), key=lambda entry: entry.date
+                            )
+                        ]
+                    },
+                    f,
+                    indent=2,
+                )
+            set_default_mode(tmp_path)
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _make_entry(filename: str, content: bytes, stat: os.stat_result) -> HistoryEntry:
+        match = REPORT_FILENAME_PATTERN.fullmatch(filename)
+        if match:
+            date = datetime.strptime(match.group(1), "%Y%m%d-%H%M%S")
+        else:
+            # Fall back to the modification time for reports named by hand
+            date = datetime.fromtimestamp(stat.st_mtime)
+        return HistoryEntry(
+            filename=filename,
+            date=date,
+            size=stat.st_size,
+            mtime=stat.st_mtime,
+            sha256=hashlib.sha256(content).hexdigest(),
+        )
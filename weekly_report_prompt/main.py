@@ -1,7 +1,14 @@
-from git_data_collector import GitDataCollector
-from prompt_generator import PromptGenerator
-from report_file_manager import ReportFileManager
-from schemas import CommitDataSummary
+import argparse
+import os
+import time
+
+# GitPython, pydantic and tiktoken are slow to import, so the modules using them are imported
+# where they are first needed; `--help` and configuration errors never load them
+from const import DEFAULT_BUILD_DIR
+from pipeline import Replayable, iter_results
+from profiler import profiler
+from token_counter import preload_encoding
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from config_loader import ConfigLoader
 from rich.console import Console
@@ -10,98 +17,138 @@ from rich.text import Text
 from rich.table import Table
 
 
-def summarize_commit_data(commits):
-    """Generate summary information for Git data."""
-    return CommitDataSummary(
-        start_date=min([commit.date for commit in commits], default=datetime.now()),
-        end_date=max([commit.date for commit in commits], default=datetime.now()),
-        total_commits=len(commits),
-        total_insertions=sum(commit.stats.insertions for commit in commits),
-        total_deletions=sum(commit.stats.deletions for commit in commits),
-        total_files_changed=sum(commit.stats.files for commit in commits),
-    )
+def summarize_commit_data(commits, directory_depth=1):
+    """Generate summary information for Git data, with daily, weekly and per-directory breakdowns."""
+    from aggregation import summarize_commits
 
+    return summarize_commits(commits, directory_depth)
 
-# Create ConfigLoader instance and load settings
-def main():
-    console = Console(force_terminal=True, color_system="truecolor")
 
-    # Welcome message
-    welcome_panel = Panel(
-        Text("Weekly Report Prompt Generator", style="bold blue"),
-        subtitle="Generating prompt for weekly development report",
-        border_style="blue",
-    )
-    console.print(welcome_panel)
+def get_project_name(repo_path):
+    from mirror_cache import get_remote_name, is_remote_url
 
-    # Initialize components
-    console.print("Initializing configuration...")
-    config = ConfigLoader()
-    repo_paths = config.get_repositories()
-    file_mgr = ReportFileManager(config_loader=config)
+    if is_remote_url(repo_path):
+        return get_remote_name(repo_path)
+    return repo_path.rstrip("/").split("/")[-1]
 
-    # Clear previous prompt files
-    console.print("Clearing previous prompt files...")
-    file_mgr.clear_previous_prompts()
 
-    # Process previous reports
-    console.print("Processing previous reports...")
-    file_mgr.move_previous_reports()
-    previous_reports = file_mgr.fetch_report_history()
-    memo = file_mgr.fetch_memo()
+def collect_project_data(
+    config, repo_path, members, commit_cache=None, collector=None, mirror_cache=None
+):
+    """Collect the commits of a single repository once and split them between the members.
 
-    # Set the starting point based on the last report date
-    console.print("Determining report date range...")
-    last_report_date = file_mgr.get_last_report_date()
-    if not last_report_date:
-        console.print(
-            "[yellow]⚠️  No previous report found. Collecting commits from the last 7 days.[/yellow]"
-        )
-        last_report_date = (datetime.now() - timedelta(days=7)).replace(
-            hour=0, minute=0, second=0, microsecond=0
-        )
-    else:
-        console.print(
-            f"[green]📅 Using last report date: {last_report_date.strftime('%Y-%m-%d %H:%M:%S')}[/green]"
+    An open `collector` for the repository is reused instead of opening the repository again.
+    A remote repository is fetched into its mirror in `mirror_cache` first.
+    """
+    with profiler.stage(f"collect {get_project_name(repo_path)}"):
+        return _collect_project_data(
+            config, repo_path, members, commit_cache, collector, mirror_cache
         )
 
-    # Display the actual reference period
-    current_time = datetime.now()
-    console.print(
-        f"[cyan]📊 Data collection period: {last_report_date.strftime('%Y-%m-%d %H:%M:%S')} ~ Now [/cyan]"
+
+def _collect_project_data(config, repo_path, members, commit_cache, collector, mirror_cache):
+    from git_data_collector import GitDataCollector
+    from mirror_cache import is_remote_url
+    from team import (
+        combine_author_patterns,
+        get_common_reported_commits,
+        get_shared_watermark,
+        partition_commits,
     )
 
-    # Collect data from repositories
-    console.print("Collecting commit data...")
-    project_data = []
+    since_date = min(member.since_date for member in members)
+    if collector is None:
+        git_dir = None
+        if is_remote_url(repo_path):
+            git_dir = mirror_cache.update(
+                repo_path, since_date, config.get_repository_setting(repo_path, "branch")
+            )
+        collector = GitDataCollector(
+            config_loader=config,
+            repo_path=repo_path,
+            commit_cache=commit_cache,
+            author_patterns=combine_author_patterns(members),
+            git_dir=git_dir,
+        )
+    # Pin the tip first, so commits landing during collection are left for the next run
+    head_commit = collector.get_head_commit()
+    since_commit = get_shared_watermark(members, repo_path, collector)
+    recent_commits = collector.collect_commits(
+        since_date=since_date,
+        since_commit=since_commit,
+        until_commit=head_commit,
+        exclude_ids=get_common_reported_commits(members, repo_path),
+    )
+    if len(members) > 1:
+        member_commits = partition_commits(
+            members,
+            repo_path,
+            collector,
+            recent_commits,
+            since_date,
+            since_commit,
+            head_commit,
+        )
+    else:
+        # A single member's window is the collection window
+        member_commits = [recent_commits]
+    return {
+        "project_name": get_project_name(repo_path),
+        "repo_path": repo_path,
+        "head_commit": head_commit,
+        "recent_commits": recent_commits,
+        "member_commits": member_commits,
+    }
 
-    for idx, repo_path in enumerate(repo_paths):
-        project_name = repo_path.rstrip("/").split("/")[-1]
-        console.print(f"Collecting data from {project_name}...")
 
-        collector = GitDataCollector(config_loader=config, repo_path=repo_path)
-        recent_commits = collector.collect_commits(since_date=last_report_date)
-        summary_data = summarize_commit_data(recent_commits)
+def iter_collected_projects(repo_paths, futures, members, console, failed_projects):
+    """Yield the collected data of each repository in configuration order, as soon as it is ready.
 
-        project_data.append(
-            {
-                "project_name": project_name,
-                "repo_path": repo_path,
-                "recent_commits": recent_commits,
-                "summary": summary_data,
-            }
-        )
+    Progress is printed as each repository comes in; failed repositories are added to `failed_projects`.
+    """
+    is_team = members[0].name is not None
+    for repo_path, future in zip(repo_paths, iter_results(futures)):
+        project_name = get_project_name(repo_path)
+        try:
+            project = future.result()
+        except Exception as e:
+            failed_projects.append(project_name)
+            console.print(f"[red]❌ {project_name}: Failed to collect data ({type(e).__name__}: {e})[/red]")
+            continue
 
         # Show progress for each repository
-        commit_count = len(recent_commits)
+        commit_count = len(project["recent_commits"])
         if commit_count > 0:
+            member_counts = ""
+            if is_team:
+                member_counts = " (" + ", ".join(
+                    f"{member.name}: {len(commits)}"
+                    for member, commits in zip(members, project["member_commits"])
+                ) + ")"
             console.print(
-                f"[green]✅ {project_name}: {commit_count} commits found[/green]"
+                f"[green]✅ {project_name}: {commit_count} commits found{member_counts}[/green]"
             )
         else:
             console.print(f"[dim]⚪ {project_name}: No commits found[/dim]")
+        yield project
+
+
+def iter_member_project_data(config, project_data, member_index):
+    """Yield the per-project data of a single member."""
+    directory_depth = config.get_directory_depth()
+    for project in project_data:
+        commits = project["member_commits"][member_index]
+        yield {
+            "project_name": project["project_name"],
+            "repo_path": project["repo_path"],
+            "head_commit": project["head_commit"],
+            "recent_commits": commits,
+            "summary": summarize_commit_data(commits, directory_depth),
+        }
+
 
-    # Create summary table
+def build_summary_table(project_data, project_token_counts=None):
+    """Create the per-repository summary table, with a token column once the prompt is generated."""
     summary_table = Table(
         title="Repository Summary", show_header=True, header_style="bold magenta"
     )
@@ -110,11 +157,14 @@ def main():
     summary_table.add_column("Insertions", justify="right", style="green")
     summary_table.add_column("Deletions", justify="right", style="red")
     summary_table.add_column("Files Changed", justify="right", style="yellow")
+    if project_token_counts is not None:
+        summary_table.add_column("Tokens", justify="right", style="blue")
 
     total_commits = 0
     total_insertions = 0
     total_deletions = 0
     total_files = 0
+    total_tokens = 0
 
     for project in project_data:
         summary = project["summary"]
@@ -123,76 +173,562 @@ def main():
         total_deletions += summary.total_deletions
         total_files += summary.total_files_changed
 
-        summary_table.add_row(
+        row = [
             project["project_name"],
             str(summary.total_commits),
             str(summary.total_insertions),
             str(summary.total_deletions),
             str(summary.total_files_changed),
-        )
+        ]
+        if project_token_counts is not None:
+            project_tokens = project_token_counts.get(project["repo_path"], 0)
+            total_tokens += project_tokens
+            row.append(str(project_tokens))
+        summary_table.add_row(*row)
 
     # Add total row
-    summary_table.add_row(
+    total_row = [
         "[bold]TOTAL[/bold]",
         f"[bold]{total_commits}[/bold]",
         f"[bold]{total_insertions}[/bold]",
         f"[bold]{total_deletions}[/bold]",
         f"[bold]{total_files}[/bold]",
-        style="bold",
+    ]
+    if project_token_counts is not None:
+        total_row.append(f"[bold]{total_tokens}[/bold]")
+    summary_table.add_row(*total_row, style="bold")
+
+    return summary_table
+
+
+def build_breakdown_tables(project_data, breakdowns, limit):
+    """Create the activity tables: weekly and daily over all repositories, and the most changed directories."""
+    from aggregation import merge_activity
+
+    tables = []
+    period_titles = {"weekly": ("Weekly Activity", "Week of"), "daily": ("Daily Activity", "Day")}
+    for breakdown, (title, key_header) in period_titles.items():
+        if breakdown not in breakdowns:
+            continue
+        rows = merge_activity(
+            [getattr(project["summary"], breakdown) for project in project_data]
+        )
+        # A single period would only repeat the totals
+        if len(rows) < 2:
+            continue
+        table = _make_activity_table(title, [key_header])
+        for stats in rows[-limit:]:
+            table.add_row(*_activity_row(stats, [stats.key]))
+        tables.append(table)
+
+    if "directories" in breakdowns:
+        table = _make_activity_table("Most Changed Directories", ["Project", "Directory"])
+        for project in project_data:
+            for stats in project["summary"].directories[:limit]:
+                table.add_row(*_activity_row(stats, [project["project_name"], stats.key]))
+        if table.row_count:
+            tables.append(table)
+    return tables
+
+
+def _make_activity_table(title, key_headers):
+    table = Table(title=title, show_header=True, header_style="bold magenta")
+    for key_header in key_headers:
+        table.add_column(key_header, style="cyan")
+    table.add_column("Commits", justify="right", style="green")
+    table.add_column("Insertions", justify="right", style="green")
+    table.add_column("Deletions", justify="right", style="red")
+    table.add_column("Files Changed", justify="right", style="yellow")
+    return table
+
+
+def _activity_row(stats, keys):
+    return [
+        *keys,
+        str(stats.commits),
+        str(stats.insertions),
+        str(stats.deletions),
+        str(stats.files),
+    ]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Weekly Report Prompt Generator")
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the on-disk commit cache",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print the time spent in each stage and write a JSON trace to build/profile",
+    )
+    parser.add_argument(
+        "--cprofile",
+        action="store_true",
+        help="Like --profile, and also save cProfile stats of the slowest stage "
+        "(stages running in parallel are skipped; set max_workers: 1 to profile them all)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and regenerate the prompts when a repository's checked-out commit "
+        "or a memo changes, until interrupted with Ctrl+C",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=5,
+        help="With --watch, seconds between checks for changes (default: 5)",
+    )
+    parser.add_argument(
+        "--export",
+        nargs="?",
+        const="jsonl",
+        choices=["jsonl", "columnar"],
+        help="Also save the collected commits and summaries to the build directory's datasets/ "
+        "folder, as JSON Lines (default) or as gzip-compressed columns",
     )
+    parser.add_argument(
+        "--from-dataset",
+        metavar="PATH",
+        help="Generate the prompt from a dataset saved with --export instead of the repositories",
+    )
+    args = parser.parse_args()
+    if args.watch and (args.export or args.from_dataset):
+        parser.error("--watch cannot be combined with --export or --from-dataset")
+    # The cProfile stats are reported with the rest of the profile
+    if args.cprofile:
+        args.profile = True
+    return args
 
-    console.print(summary_table)
 
-    # Check if any commits were found
-    if not project_data or all(len(p["recent_commits"]) == 0 for p in project_data):
-        error_panel = Panel(
-            "[red]❌ No commits found in the specified period.[/red]\n"
-            "[yellow]Please check the author configuration or adjust the time period.[/yellow]",
-            title="Error",
-            border_style="red",
+def report_profile(console, use_cprofile=False):
+    """Print the stage timings and write the trace, and the cProfile stats of the slowest stage."""
+    console.print(profiler.build_table())
+    profile_dir = os.path.join(DEFAULT_BUILD_DIR, "profile")
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    trace_path = os.path.join(profile_dir, f"trace-{timestamp}.json")
+    profiler.write_trace(trace_path)
+    console.print(f"[magenta]⏱️  Trace file: {trace_path}[/magenta]")
+
+    if use_cprofile:
+        stage_name = profiler.slowest_cprofile_stage()
+        if stage_name is None:
+            return
+        stats_path = os.path.join(profile_dir, f"cprofile-{timestamp}.pstats")
+        console.print(f"[bold]cProfile of the slowest stage: {stage_name}[/bold]")
+        console.out(profiler.dump_cprofile(stage_name, stats_path), highlight=False)
+        console.print(f"[magenta]⏱️  cProfile stats: {stats_path}[/magenta]")
+
+
+def prepare_member(config, member, console):
+    """Archive the member's filled-in reports and determine the period to collect for them."""
+    file_mgr = member.file_mgr
+
+    # Clear previous prompt files
+    console.print("Clearing previous prompt files...")
+    file_mgr.clear_previous_prompts()
+
+    # Process previous reports
+    console.print("Processing previous reports...")
+    archived_reports = file_mgr.move_previous_reports()
+    if member.collection_state is not None:
+        # Reports filled in since the last run advance the per-repository watermarks
+        member.collection_state.finalize_pending(archived_reports)
+        member.collection_state.save()
+    member.previous_reports = file_mgr.fetch_report_history()
+    member.memo = file_mgr.fetch_memo()
+
+    # Set the starting point based on the last report date
+    console.print("Determining report date range...")
+    last_report_date = file_mgr.get_last_report_date()
+    if not last_report_date:
+        console.print(
+            "[yellow]⚠️  No previous report found. Collecting commits from the last 7 days.[/yellow]"
         )
-        console.print(error_panel)
+        last_report_date = (datetime.now() - timedelta(days=7)).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+    else:
+        console.print(
+            f"[green]📅 Using last report date: {last_report_date.strftime('%Y-%m-%d %H:%M:%S')}[/green]"
+        )
+    member.since_date = last_report_date
+
+    # Display the actual reference period
+    console.print(
+        f"[cyan]📊 Data collection period: {last_report_date.strftime('%Y-%m-%d %H:%M:%S')} ~ Now [/cyan]"
+    )
+
+
+def create_member_report(member, project_data, console):
+    """Create the member's blank report, and record the collected commits as pending on it."""
+    file_mgr = member.file_mgr
+    # A regenerated prompt keeps the report file created with the first one
+    if member.report_file_path is None or not os.path.exists(member.report_file_path):
+        console.print("Creating report file...")
+        with profiler.stage("create report file"):
+            member.report_file_path = file_mgr.create_report_file()
+    report_file_path = member.report_file_path
+    if member.collection_state is not None:
+        for project in project_data:
+            member.collection_state.set_pending(
+                os.path.basename(report_file_path),
+                project["repo_path"],
+                project["head_commit"],
+                [commit.id for commit in project["recent_commits"]],
+            )
+        member.collection_state.save()
+
+
+def export_member_dataset(member, project_data, dataset_format, console):
+    """Save the member's collected commits and summaries for other tools and for --from-dataset."""
+    from dataset import DATASET_FORMATS, write_dataset
+
+    dataset_dir = os.path.join(member.file_mgr.build_dir, "datasets")
+    os.makedirs(dataset_dir, exist_ok=True)
+    path = os.path.join(
+        dataset_dir,
+        f"activity-{member.file_mgr.get_today_str()}{DATASET_FORMATS[dataset_format]}",
+    )
+    with profiler.stage("export dataset"):
+        write_dataset(path, project_data, member.name, member.since_date, dataset_format)
+    console.print(f"[magenta]📦 Dataset file: {path}[/magenta]")
+    return path
+
+
+def render_from_dataset(config, members, path, console):
+    """Generate the prompt of the member a dataset was saved for, without reading any repository.
+
+    The previous reports and memo are read as they are now; reports are not archived and no
+    report file is created.
+    """
+    from dataset import read_dataset
+
+    with profiler.stage("read dataset"):
+        dataset = read_dataset(path)
+    member = next((member for member in members if member.name == dataset.member), None)
+    if member is None:
         raise ValueError(
-            "No commits found in the specified period. Please check the author configuration or adjust the time period."
+            f"The dataset was saved for team member '{dataset.member}', who is not in the configuration"
         )
+    if member.name is not None:
+        console.print(f"[bold]👤 {member.name}[/bold]")
+    console.print(
+        f"[cyan]📦 Using dataset {path}: {len(dataset.project_data)} repositories[/cyan]"
+    )
+    member.file_mgr.clear_previous_prompts()
+    member.previous_reports = member.file_mgr.fetch_report_history()
+    member.memo = member.file_mgr.fetch_memo()
+    member.since_date = dataset.since_date
+    return write_member_prompt(
+        config, member, dataset.project_data, console, create_report=False
+    )
+
+
+class NoCommitsFound(Exception):
+    """Raised while streaming a prompt that turns out to have no commits, to discard it."""
+
+
+def write_member_prompt(
+    config, member, project_data, console, section_cache=None, create_report=True
+):
+    """Generate the member's prompt and blank report; return False if they have no commits.
+
+    `project_data` may still be in the making: the prompt is written while later repositories are collected.
+    A `section_cache` kept between calls lets unchanged repositories reuse their formatted sections.
+    Without `create_report`, only the prompt is written, e.g. when it is rendered again from a dataset.
+    """
+    from prompt_generator import PromptGenerator
+
+    file_mgr = member.file_mgr
+    title_suffix = f": {member.name}" if member.name is not None else ""
 
     # Generate prompt and save files
-    console.print("Generating prompt...")
+    console.print("Generating prompt file...")
     prompt_gen = PromptGenerator(
         project_data=project_data,
         config_loader=config,
-        previous_reports=previous_reports,
-        memo=memo,
+        previous_reports=member.previous_reports,
+        memo=member.memo,
+        section_cache=section_cache,
     )
-    final_prompt_for_llm = prompt_gen.generate_prompt()
+    token_budget = config.get_token_budget()
 
-    console.print("Saving files...")
-    file_mgr.save_prompt(final_prompt_for_llm)
-    file_mgr.create_report_file()
+    def iter_prompt():
+        yield from prompt_gen.iter_prompt(token_budget=token_budget)
+        # Only known once every repository is in; the unfinished prompt file is then removed
+        if all(len(p["recent_commits"]) == 0 for p in project_data):
+            raise NoCommitsFound()
+
+    # The prompt is streamed straight into the file, one section or commit at a time
+    try:
+        with profiler.stage("generate prompt"):
+            file_mgr.save_prompt(iter_prompt())
+    except NoCommitsFound:
+        console.print(build_summary_table(project_data))
+        error_panel = Panel(
+            "[red]❌ No commits found in the specified period.[/red]\n"
+            "[yellow]Please check the author configuration or adjust the time period.[/yellow]",
+            title=f"Error{title_suffix}",
+            border_style="red",
+        )
+        console.print(error_panel)
+        return False
+
+    console.print(build_summary_table(project_data, prompt_gen.project_token_counts))
+    for table in build_breakdown_tables(
+        project_data, config.get_activity_breakdowns(), config.get_breakdown_limit()
+    ):
+        console.print(table)
+
+    if create_report:
+        create_member_report(member, project_data, console)
 
     # Get approximate token counts (Using tiktoken: May differ from the number of tokens used by the LLM model)
-    token_counts = prompt_gen.count_approximate_tokens(final_prompt_for_llm)
+    # Counted per section while the prompt was generated
+    token_counts = prompt_gen.total_tokens
     # 1M tokens is a rough threshold for large prompts
     if token_counts > 1000000:
         console.print(
             "[yellow]⚠️ The prompt is very large, which may lead to high costs or errors when using the LLM model.[/yellow]\n"
-            "[yellow]Consider adjusting the max_diff_lines setting in config.yaml to reduce the size of the prompt.[/yellow]"
+            "[yellow]Consider setting token_budget or adjusting max_diff_lines in config.yaml to reduce the size of the prompt.[/yellow]"
+        )
+
+    if token_budget is not None and token_counts > token_budget:
+        console.print(
+            f"[yellow]⚠️ The prompt exceeds the token budget ({token_counts} > {token_budget}).[/yellow]\n"
+            "[yellow]Consider lowering max_memo_tokens, max_report_tokens or report_history_limit in config.yaml.[/yellow]"
         )
 
     # Success message
     prompt_file_path = file_mgr.prompt_file_path
+    deduplication_line = ""
+    if prompt_gen.deduplicated_diffs:
+        deduplication_line = (
+            f"[blue]♻️ Repeated diffs shown once: {prompt_gen.deduplicated_diffs} commits, "
+            f"about {prompt_gen.deduplicated_tokens} tokens saved[/blue]\n"
+        )
     success_panel = Panel(
         "[green]🎉 Weekly report prompt generation completed successfully![/green]\n"
-        f"[cyan]📊 Data period: {last_report_date.strftime('%Y-%m-%d %H:%M:%S')} ~ Now [/cyan]\n"
+        f"[cyan]📊 Data period: {member.since_date.strftime('%Y-%m-%d %H:%M:%S')} ~ Now [/cyan]\n"
         f"[blue]📝 Approximate token count: {token_counts}[/blue]\n"
+        f"{deduplication_line}"
         "[dim]Token count is calculated using tiktoken and is for reference only. The actual number of tokens used by the LLM model may differ.[/dim]\n"
         "[dim]Check the generated prompt and template files in your output directory.[/dim]",
-        title="Success",
+        title=f"Success{title_suffix}",
         border_style="green",
     )
     console.print(success_panel)
     if prompt_file_path:
         console.print(f"[magenta]📄 Prompt file: {prompt_file_path}[/magenta]")
+    return True
+
+
+def watch(config, repo_paths, members, commit_cache, mirror_cache, console, interval):
+    """Regenerate the prompts whenever a repository's checked-out commit or a memo changes, until interrupted.
+
+    The repositories stay open and the tokenizer loaded between runs. Only the repositories that
+    changed are collected again; the prompt sections of the others are reused.
+    """
+    from watcher import RepositoryWatcher
+
+    is_team = members[0].name is not None
+    watcher = RepositoryWatcher(config, repo_paths, members, commit_cache, mirror_cache)
+    # The memos were just read by prepare_member
+    watcher.changed_memos()
+    # Per member: repository -> the member's project data, and the formatted sections
+    member_projects = [{} for _ in members]
+    section_caches = [{} for _ in members]
+
+    console.print(
+        f"[cyan]👀 Watching {len(repo_paths)} repositories and memos every {interval:g}s. "
+        "Press Ctrl+C to stop.[/cyan]"
+    )
+    with ThreadPoolExecutor(max_workers=config.get_max_workers()) as executor:
+        while True:
+            with profiler.stage("poll for changes"):
+                changed_repo_paths = watcher.changed_repositories()
+                changed_memos = watcher.changed_memos()
+            changed_members = set(changed_memos)
+            for member_index in changed_memos:
+                members[member_index].memo = members[member_index].file_mgr.fetch_memo()
+
+            if changed_repo_paths:
+                console.print(
+                    f"Collecting commit data from {len(changed_repo_paths)} changed repositories..."
+                )
+                failed_projects = []
+                futures = [
+                    executor.submit(
+                        collect_project_data,
+                        config,
+                        repo_path,
+                        members,
+                        commit_cache,
+                        watcher.get_collector(repo_path),
+                        mirror_cache,
+                    )
+                    for repo_path in changed_repo_paths
+                ]
+                collected = {
+                    project["repo_path"]: project
+                    for project in iter_collected_projects(
+                        changed_repo_paths, futures, members, console, failed_projects
+                    )
+                }
+                for member_index, projects in enumerate(member_projects):
+                    for repo_path in changed_repo_paths:
+                        # Failed repositories are left out, as in a single run
+                        projects.pop(repo_path, None)
+                    for project in iter_member_project_data(config, collected.values(), member_index):
+                        projects[project["repo_path"]] = project
+                if failed_projects:
+                    console.print(
+                        f"[yellow]⚠️  Skipped {len(failed_projects)} repositories due to errors: {', '.join(failed_projects)}[/yellow]"
+                    )
+                changed_members = set(range(len(members)))
+
+            for member_index in sorted(changed_members):
+                member = members[member_index]
+                if is_team:
+                    console.print(f"[bold]👤 {member.name}[/bold]")
+                if member_index in changed_memos:
+                    console.print("Memo changed, regenerating prompt...")
+                project_data = [
+                    member_projects[member_index][repo_path]
+                    for repo_path in repo_paths
+                    if repo_path in member_projects[member_index]
+                ]
+                write_member_prompt(
+                    config, member, project_data, console, section_caches[member_index]
+                )
+            time.sleep(interval)
+
+
+# Create ConfigLoader instance and load settings
+def main():
+    args = parse_args()
+    if args.profile:
+        profiler.enable(use_cprofile=args.cprofile)
+    console = Console(force_terminal=True, color_system="truecolor")
+
+    # Welcome message
+    welcome_panel = Panel(
+        Text("Weekly Report Prompt Generator", style="bold blue"),
+        subtitle="Generating prompt for weekly development report",
+        border_style="blue",
+    )
+    console.print(welcome_panel)
+
+    # Initialize components
+    console.print("Initializing configuration...")
+    with profiler.stage("load config"):
+        config = ConfigLoader()
+        repo_paths = config.get_repositories()
+        with profiler.stage("import modules"):
+            from commit_cache import CommitCache
+            from team import load_team_members
+        # Without a team, the configured author is the only member
+        members = load_team_members(config)
+    is_team = members[0].name is not None
+
+    if args.from_dataset:
+        written = render_from_dataset(config, members, args.from_dataset, console)
+        if args.profile:
+            report_profile(console, args.cprofile)
+        if not written:
+            raise ValueError("The dataset has no commits.")
+        return
+
+    for member in members:
+        if is_team:
+            console.print(f"[bold]👤 {member.name}[/bold]")
+        with profiler.stage("prepare reports"):
+            prepare_member(config, member, console)
+
+    # The tokenizer is loaded while git is busy, rather than when the first section is counted
+    preload_encoding()
+
+    commit_cache = None
+    if not args.no_cache:
+        commit_cache = CommitCache(
+            os.path.join(DEFAULT_BUILD_DIR, "cache", "commits.sqlite3"),
+            max_size_bytes=config.get_cache_max_size_mb() * 1024 * 1024,
+        )
+
+    # Remote repositories are fetched into mirrors shared by all runs; like the collector, this
+    # loads GitPython, which --from-dataset never needs
+    from mirror_cache import MirrorCache
+
+    mirror_cache = MirrorCache(os.path.join(DEFAULT_BUILD_DIR, "cache", "mirrors"))
+
+    if args.watch:
+        try:
+            watch(config, repo_paths, members, commit_cache, mirror_cache, console, args.interval)
+        except KeyboardInterrupt:
+            console.print("[cyan]👋 Stopped watching.[/cyan]")
+        finally:
+            if commit_cache is not None:
+                commit_cache.close()
+        if args.profile:
+            report_profile(console, args.cprofile)
+        return
+
+    # Collect data from repositories, once for all members
+    max_workers = config.get_max_workers()
+    console.print(
+        f"Collecting commit data from {len(repo_paths)} repositories (max workers: {max_workers})..."
+    )
+    failed_projects = []
+    written = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                collect_project_data,
+                config,
+                repo_path,
+                members,
+                commit_cache,
+                mirror_cache=mirror_cache,
+            )
+            for repo_path in repo_paths
+        ]
+        # The first prompt is formatted and written while the later repositories are still
+        # being collected; results come in configuration order so the output stays deterministic
+        project_data = Replayable(
+            iter_collected_projects(repo_paths, futures, members, console, failed_projects)
+        )
+
+        # One prompt and report per member
+        for member_index, member in enumerate(members):
+            if is_team:
+                console.print(f"[bold]👤 {member.name}[/bold]")
+            member_project_data = Replayable(
+                iter_member_project_data(config, project_data, member_index)
+            )
+            if write_member_prompt(config, member, member_project_data, console):
+                written += 1
+            if args.export:
+                export_member_dataset(member, member_project_data, args.export, console)
+
+    if commit_cache is not None:
+        commit_cache.close()
+
+    if failed_projects:
+        console.print(
+            f"[yellow]⚠️  Skipped {len(failed_projects)} repositories due to errors: {', '.join(failed_projects)}[/yellow]"
+        )
+
+    if args.profile:
+        report_profile(console, args.cprofile)
+
+    if written == 0:
+        raise ValueError(
+            "No commits found in the specified period. Please check the author configuration or adjust the time period."
+        )
 
 
 if __name__ == "__main__":
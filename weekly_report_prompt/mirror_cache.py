@@ -0,0 +1,104 @@
+import hashlib
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+import git
+
+from profiler import profiler
+
+# The branch collected from a remote repository is fetched into this ref, which HEAD of the mirror points to
+MIRROR_REF = "refs/heads/report"
+# Matches "scheme://host/path" and scp-like "user@host:path" URLs
+REMOTE_URL_PATTERN = re.compile(r"^(?:[a-z][a-z0-9+.-]*://|[^/@:]+@[^/:]+:)", re.IGNORECASE)
+# Earliest commit date fetched into a mirror so far, as a Unix timestamp
+SHALLOW_SINCE_CONFIG_KEY = "weeklyReport.shallowSince"
+
+
+def is_remote_url(repository: str) -> bool:
+    """Return whether a repository entry is a URL to mirror rather than a local path."""
+    return bool(REMOTE_URL_PATTERN.match(repository))
+
+
+def get_remote_name(url: str) -> str:
+    """Return the repository name at the end of the URL, without ".git"."""
+    path = url.rstrip("/")
+    if path.endswith("/.git"):
+        # The .git directory of a working tree
+        path = path[: -len("/.git")]
+    name = re.split(r"[/:]", path)[-1]
+    return name[: -len(".git")] if name.endswith(".git") else name
+
+
+class MirrorCache:
+    """Bare, shallow and blobless mirrors of remote repositories, shared by all runs and team members.
+
+    A mirror holds one branch, back to the earliest date collected so far, and is updated by fetching
+    only the commits added since. Blobs are fetched on demand when git reads a diff, so disk use and
+    transfer follow the report window rather than the whole history.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def get_mirror_path(self, url: str, branch: Optional[str] = None) -> str:
+        name = re.sub(r"[^A-Za-z0-9._-]", "_", get_remote_name(url))
+        digest = hashlib.sha1(f"{url}\0{branch or ''}".encode()).hexdigest()[:12]
+        return os.path.join(self.cache_dir, f"{name}-{digest}.git")
+
+    def update(self, url: str, since_date: datetime, branch: Optional[str] = None) -> str:
+        """Fetch the branch, or the remote's default branch, back to `since_date`; return the mirror's path."""
+        path = self.get_mirror_path(url, branch)
+        with self._get_lock(path), profiler.stage("update mirror"):
+            if os.path.isdir(path):
+                repo = git.Repo(path)
+            else:
+                repo = self._create_mirror(path, url)
+            refspec = f"+{f'refs/heads/{branch}' if branch else 'HEAD'}:{MIRROR_REF}"
+
+            since = int(since_date.timestamp())
+            shallow_since = repo.git.config("--get", SHALLOW_SINCE_CONFIG_KEY, with_exceptions=False)
+            if shallow_since and since >= int(shallow_since):
+                # Only the commits added since the last update are transferred
+                repo.git.fetch("origin", refspec, filter="blob:none", quiet=True)
+                return path
+
+            try:
+                repo.git.fetch(
+                    "origin",
+                    refspec,
+                    filter="blob:none",
+                    shallow_since=since_date.strftime("%Y-%m-%d %H:%M:%S"),
+                    quiet=True,
+                )
+                # The oldest commits in the window get their parents, so their diffs are not
+                # shown as whole-tree additions
+                repo.git.fetch("origin", refspec, filter="blob:none", deepen=1, quiet=True)
+            except git.GitCommandError as e:
+                if "no commits selected for shallow requests" not in str(e.stderr):
+                    raise
+                # Nothing new in the window; the tip is enough for later updates to build on
+                repo.git.fetch("origin", refspec, filter="blob:none", depth=1, quiet=True)
+            repo.git.config(SHALLOW_SINCE_CONFIG_KEY, str(since))
+        return path
+
+    @staticmethod
+    def get_remote_head(url: str, branch: Optional[str] = None) -> Optional[str]:
+        """Return the commit at the tip of the remote branch, asking the remote without fetching."""
+        output = git.Git().ls_remote(url, f"refs/heads/{branch}" if branch else "HEAD")
+        return output.split("\t", 1)[0] or None
+
+    @staticmethod
+    def _create_mirror(path: str, url: str) -> git.Repo:
+        repo = git.Repo.init(path, mkdir=True, bare=True)
+        repo.create_remote("origin", url)
+        repo.git.symbolic_ref("HEAD", MIRROR_REF)
+        return repo
+
+    def _get_lock(self, path: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(path, threading.Lock())
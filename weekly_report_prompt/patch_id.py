@@ -0,0 +1,52 @@
+import hashlib
+from typing import Optional
+
+# Digest size of SHA-1, which the per-file hashes are summed in
+_MODULUS = 1 << 160
+
+
+class PatchIdHasher:
+    """Compute the stable patch ID of a diff line by line, like `git patch-id --stable`.
+
+    Whitespace, line numbers and the blob IDs of text files are ignored, so the same change applied
+    to different commits or repositories gets the same ID. Each file is hashed on its own and the
+    hashes are summed, so the order of the files does not matter either.
+    """
+
+    def __init__(self):
+        self._total = 0
+        self._file_hash: Optional["hashlib._Hash"] = None
+        self._blob_ids = b""
+        self._hashed = False
+
+    def update(self, raw_line: bytes):
+        if raw_line.startswith(b"diff "):
+            self._flush_file()
+            self._file_hash = hashlib.sha1()
+            self._blob_ids = b""
+        elif self._file_hash is None or raw_line.startswith((b"@@ -", b"\\")):
+            # Where the hunks apply and "\ No newline at end of file" are left out
+            return
+        elif raw_line.startswith(b"index "):
+            self._blob_ids = raw_line.split()[1]
+            return
+        elif raw_line.startswith(b"Binary files "):
+            # The blob IDs are all there is to tell binary changes apart
+            self._file_hash.update(self._blob_ids)
+        self._file_hash.update(b"".join(raw_line.split()))
+
+    def hexdigest(self) -> str:
+        """Return the patch ID, or an empty string for an empty diff."""
+        self._flush_file()
+        if not self._hashed:
+            return ""
+        return self._total.to_bytes(20, "little").hex()
+
+    def _flush_file(self):
+        if self._file_hash is not None:
+            self._total = (
+                self._total + int.from_bytes(self._file_hash.digest(), "little")
+            ) % _MODULUS
+            self._hashed = True
+        self._file_hash = None
+
@@ -0,0 +1,46 @@
+from concurrent.futures import Future
+from typing import Generic, Iterable, Iterator, List, TypeVar
+
+from profiler import profiler
+
+T = TypeVar("T")
+
+
+class Replayable(Generic[T]):
+    """Iterate over a lazily produced sequence any number of times.
+
+    Items are pulled from the source only when an iteration first reaches them and are kept
+    for the next iterations, so a consumer can start on the first items while later ones are
+    still being produced, and later consumers see the same items without producing them again.
+    """
+
+    def __init__(self, source: Iterable[T]):
+        self._source = iter(source)
+        self._items: List[T] = []
+        self._exhausted = False
+
+    def __iter__(self) -> Iterator[T]:
+        index = 0
+        while True:
+            if index < len(self._items):
+                yield self._items[index]
+                index += 1
+                continue
+            if self._exhausted:
+                return
+            try:
+                item = next(self._source)
+            except StopIteration:
+                self._exhausted = True
+                return
+            self._items.append(item)
+
+
+def iter_results(futures: Iterable[Future]) -> Iterator[Future]:
+    """Yield the futures in the given order once each is done, timing the wait for them."""
+    for future in futures:
+        if not future.done():
+            with profiler.stage("wait for collection"):
+                # Exceptions are left for the caller, which calls result() again
+                future.exception()
+        yield future
@@ -0,0 +1,181 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from rich.table import Table
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler._enter(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler._exit(self)
+        return False
+
+
+class Profiler:
+    """Wall-clock timers and counters around the stages of a run.
+
+    Stages may nest and may run on several threads; each stage's self time excludes the stages
+    nested in it on the same thread. While disabled, `stage()` and `count()` do nothing, so the
+    instrumentation can stay in the code.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        # Profile the outermost stages with cProfile, to report the slowest one
+        self.use_cprofile = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._start = time.perf_counter()
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.events: List[Dict] = []
+        self._thread_ids: Dict[int, int] = {}
+        self._cprofile_stats: Dict[str, pstats.Stats] = {}
+
+    def enable(self, use_cprofile: bool = False):
+        self.enabled = True
+        self.use_cprofile = use_cprofile
+        self._start = time.perf_counter()
+
+    def stage(self, name: str):
+        """Return a context manager timing the enclosed code as the named stage."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def count(self, name: str, value: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def _enter(self, stage: _Stage):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stage.child_seconds = 0.0
+        stage.cprofile = None
+        if self.use_cprofile and not stack:
+            stage.cprofile = cProfile.Profile()
+            try:
+                stage.cprofile.enable()
+            except ValueError:
+                # Only one profiler can be active at a time, so stages running in parallel are skipped
+                stage.cprofile = None
+        stack.append(stage)
+        stage.started = time.perf_counter()
+
+    def _exit(self, stage: _Stage):
+        ended = time.perf_counter()
+        seconds = ended - stage.started
+        stack = self._local.stack
+        stack.pop()
+        if stack:
+            stack[-1].child_seconds += seconds
+        if stage.cprofile is not None:
+            stage.cprofile.disable()
+
+        thread_id = threading.get_ident()
+        with self._lock:
+            totals = self.stages.setdefault(
+                stage.name, {"calls": 0, "seconds": 0.0, "self_seconds": 0.0}
+            )
+            totals["calls"] += 1
+            totals["seconds"] += seconds
+            totals["self_seconds"] += seconds - stage.child_seconds
+            self.events.append(
+                {
+                    "name": stage.name,
+                    "ph": "X",
+                    "ts": round((stage.started - self._start) * 1e6),
+                    "dur": round(seconds * 1e6),
+                    "pid": os.getpid(),
+                    "tid": self._thread_ids.setdefault(thread_id, len(self._thread_ids)),
+                }
+            )
+            if stage.cprofile is not None:
+                stats = self._cprofile_stats.get(stage.name)
+                if stats is None:
+                    self._cprofile_stats[stage.name] = pstats.Stats(stage.cprofile)
+                else:
+                    stats.add(stage.cprofile)
+
+    def build_table(self) -> "Table":
+        """Create a table of the stages, slowest first, followed by the counters."""
+        from rich.table import Table
+
+        table = Table(title="Profile", show_header=True, header_style="bold magenta")
+        table.add_column("Stage", style="cyan")
+        table.add_column("Calls", justify="right")
+        table.add_column("Total (s)", justify="right", style="green")
+        table.add_column("Self (s)", justify="right", style="yellow")
+        for name, totals in sorted(
+            self.stages.items(), key=lambda item: item[1]["seconds"], reverse=True
+        ):
+            table.add_row(
+                name,
+                str(totals["calls"]),
+                f"{totals['seconds']:.3f}",
+                f"{totals['self_seconds']:.3f}",
+            )
+        for name, value in sorted(self.counters.items()):
+            table.add_row(f"[dim]{name}[/dim]", str(value), "", "")
+        return table
+
+    def write_trace(self, path: str):
+        """Write the stages as a Chrome trace (chrome://tracing, Perfetto), with the totals and counters."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "traceEvents": self.events,
+                    "stages": self.stages,
+                    "counters": self.counters,
+                },
+                f,
+                indent=2,
+            )
+
+    def slowest_cprofile_stage(self) -> Optional[str]:
+        if not self._cprofile_stats:
+            return None
+        return max(self._cprofile_stats, key=lambda name: self.stages[name]["seconds"])
+
+    def dump_cprofile(self, stage_name: str, path: str, limit: int = 20) -> str:
+        """Save the cProfile stats of a stage to `path` and return its top functions as text."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        stats = self._cprofile_stats[stage_name]
+        stats.dump_stats(path)
+        output = io.StringIO()
+        stats.stream = output
+        stats.sort_stats("cumulative").print_stats(limit)
+        return output.getvalue()
+
+
+# Shared by all modules of a run
+profiler = Profiler()
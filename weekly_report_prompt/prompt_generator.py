@@ -1,37 +1,87 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, NamedTuple, Optional, Tuple
 
 from config_loader import ConfigLoader
-from schemas import CommitData
-import tiktoken
+from diff_condenser import condense_diff
+from profiler import profiler
+from schemas import ActivityStats, CommitDataSummary, CommitRecord
+from token_counter import DEFAULT_MODEL, count_tokens, count_tokens_batch
+
+# A budgeted diff shorter than this is not worth its code fence; the commit is shown without a diff
+MIN_BUDGETED_DIFF_LINES = 5
+# Commits formatted before their tokens are counted together on several threads; only one batch
+# of formatted diffs is held at a time
+COMMIT_BATCH_SIZE = 64
+
+
+class PromptSection(NamedTuple):
+    name: str
+    text: str
+    # Counted when the section is built, so the whole prompt never has to be encoded at once
+    tokens: int
+    # Repository of a project section, whose tokens are counted per repository
+    repo_path: Optional[str] = None
+    # Written before the text, unless this is the first section of the prompt
+    separator: str = "\n\n"
+    # Tokens saved by referring to a diff shown earlier instead of repeating it
+    deduplicated_tokens: Optional[int] = None
 
 
 class PromptGenerator:
     def __init__(
             self,
-            project_data: List[Dict[str, Any]],
+            project_data: Iterable[Dict[str, Any]],
             config_loader: ConfigLoader,
             previous_reports: Optional[List[str]] = None,
             memo: Optional[str] = None,
+            section_cache: Optional[Dict[Tuple, Any]] = None,
     ):
         """
         Args:
-            project_data: List of data per project (each dict includes project_name, recent_commits, summary, previous_report, etc.)
+            project_data: List of data per project (each dict includes project_name, repo_path, recent_commits, summary, previous_report, etc.)
+                May be any re-iterable, such as a Replayable still being collected; without a token budget
+                each project is only needed once the prompt reaches it.
             config_loader: Configuration loader instance
+            section_cache: Keeps the formatted sections of each project between generators, so a prompt
+                regenerated after some repositories changed only formats those (see main.py --watch)
         """
         self.project_data = project_data
         self.config_loader = config_loader
 
         self.max_diff_lines = config_loader.get_max_diff_lines()
+        self.diff_condensation = config_loader.get_diff_condensation()
+        self.diff_deduplication = config_loader.get_diff_deduplication()
+        self.tokenizer_threads = config_loader.get_tokenizer_threads()
         self.lang = config_loader.get_lang()
+        self.activity_breakdowns = config_loader.get_activity_breakdowns()
+        self.breakdown_limit = config_loader.get_breakdown_limit()
 
         # Load template
         self.template = config_loader.get_template()
         self.previous_reports = previous_reports if previous_reports else []
         self.memo = memo
+        self.section_cache = section_cache
+        self._used_cache_keys = set()
 
-    def _format_commit(self, commit: CommitData, include_diff: bool) -> str:
+        # Filled in by generate_prompt()
+        self.total_tokens = 0
+        self.section_token_counts: Dict[str, int] = {}
+        # Keyed by repository path, as two repositories may share a project name
+        self.project_token_counts: Dict[str, int] = {}
+        self.deduplicated_diffs = 0
+        self.deduplicated_tokens = 0
+
+    def _format_commit(
+            self, commit: CommitRecord, include_diff: bool, max_diff_lines: Optional[int] = None
+    ) -> str:
         """Format a single commit's information as a string."""
-        commit_lines = []
+        commit_text = self._format_commit_message(commit)
+        diff_text = self._format_diff(commit, max_diff_lines) if include_diff else None
+        if diff_text:
+            commit_text += "\n" + diff_text
+        return commit_text
+
+    @staticmethod
+    def _format_commit_message(commit: CommitRecord) -> str:
         # Commit message (use only the first line, or all lines; here, use all)
         # If the message has multiple lines, emphasize the first line or summarize as needed
         commit_message_lines = commit.message.strip().split("\n")
@@ -41,44 +91,277 @@ class PromptGenerator:
         if len(commit_message_lines) > 1:
             formatted_message += "\n  " + "\n  ".join(commit_message_lines[1:])
 
-        commit_lines.append(
-            f"{formatted_message} (ID: {commit.id[:7]}, Date: {commit.date.strftime('%Y-%m-%d')})"
-        )
+        return f"{formatted_message} (ID: {commit.id[:7]}, Date: {commit.date.strftime('%Y-%m-%d')})"
 
-        if include_diff and commit.diff:
-            diff_content_lines = commit.diff.strip().splitlines()
-            if len(diff_content_lines) > self.max_diff_lines:
-                diff_display = "\n".join(
-                    [
-                        f"    {line}"
-                        for line in diff_content_lines[: self.max_diff_lines]
-                    ]
-                )
-                diff_display += f"\n    ... (Some diff lines omitted, showing {self.max_diff_lines} of {len(diff_content_lines)} total lines)"
-            else:
-                diff_display = "\n".join([f"    {line}" for line in diff_content_lines])
+    def _format_diff(
+            self, commit: CommitRecord, max_diff_lines: Optional[int] = None
+    ) -> Optional[str]:
+        """Format the commit's diff as a code block, or return None if there is nothing to show."""
+        if max_diff_lines is None:
+            max_diff_lines = self.max_diff_lines
+        if not commit.diff or max_diff_lines <= 0:
+            return None
+
+        if self.diff_condensation:
+            condensed = condense_diff(commit.diff, max_diff_lines, commit.stats.per_file)
+            diff_display = "\n".join([f"    {line}" for line in condensed.lines])
+            if condensed.omitted:
+                total_lines = max(commit.diff_total_lines, len(commit.diff.splitlines()))
+                diff_display += f"\n    ... (Diff condensed, showing {condensed.diff_lines} of {total_lines} total lines)"
+            return f"  ```diff\n{diff_display}\n  ```"
+
+        diff_content_lines = commit.diff.strip().splitlines()
+        # The collector may already have truncated the diff, keeping the total line count
+        total_lines = max(commit.diff_total_lines, len(diff_content_lines))
+        if total_lines > max_diff_lines:
+            shown_lines = diff_content_lines[:max_diff_lines]
+            diff_display = "\n".join([f"    {line}" for line in shown_lines])
+            diff_display += f"\n    ... (Some diff lines omitted, showing {len(shown_lines)} of {total_lines} total lines)"
+        else:
+            diff_display = "\n".join([f"    {line}" for line in diff_content_lines])
+        return f"  ```diff\n{diff_display}\n  ```"
+
+    @staticmethod
+    def _format_diff_reference(commit: CommitRecord, project_name: str) -> str:
+        return f"  (Same changes as {commit.id[:7]} in [{project_name}], whose diff is shown above)"
 
-            commit_lines.append(f"  ```diff\n{diff_display}\n  ```")
-        return "\n".join(commit_lines)
+    def _find_repeated_diffs(self) -> Dict[str, str]:
+        """Return the reference replacing the diff of each commit whose patch ID was already seen earlier in the prompt."""
+        if not self.diff_deduplication:
+            return {}
+        first_commits: Dict[str, Tuple[CommitRecord, str]] = {}
+        references = {}
+        for project in self.project_data:
+            for commit in project["recent_commits"]:
+                if not commit.patch_id:
+                    continue
+                if commit.patch_id in first_commits:
+                    references[commit.id] = self._format_diff_reference(
+                        *first_commits[commit.patch_id]
+                    )
+                else:
+                    first_commits[commit.patch_id] = (commit, project["project_name"])
+        return references
 
     def _format_commits(
-            self, commits: List[CommitData], should_include_diff=True
+            self,
+            commits: List[CommitRecord],
+            should_include_diff=True,
+            diff_line_limits: Optional[Dict[str, int]] = None,
     ) -> str:
         """Format a list of commits as a string."""
         if not commits:
             return "  - None"
 
+        diff_line_limits = diff_line_limits or {}
         formatted_commits_text = [
-            self._format_commit(commit, include_diff=should_include_diff)
+            self._format_commit(
+                commit,
+                include_diff=should_include_diff,
+                max_diff_lines=diff_line_limits.get(commit.id),
+            )
             for commit in commits
         ]
         return "\n".join(formatted_commits_text)
 
-    def generate_prompt(self, should_include_diff=True) -> str:
-        prompt_sections = [
-            "# Weekly Work Report Request",
-            "Hello! Please draft a weekly work report based on the provided Git activity and previous report (if available).",
+    def _format_activity(self, summary: CommitDataSummary) -> List[str]:
+        """Format the configured weekly, daily and per-directory breakdowns of a summary."""
+        lines = []
+        periods = [
+            ("weekly", "Weekly activity", "Week of "),
+            ("daily", "Daily activity", ""),
+        ]
+        for breakdown, title, key_prefix in periods:
+            rows = getattr(summary, breakdown)
+            # A single period would only repeat the totals
+            if breakdown not in self.activity_breakdowns or len(rows) < 2:
+                continue
+            lines.append(f"- {title}:")
+            if len(rows) > self.breakdown_limit:
+                lines.append(f"  - ... {len(rows) - self.breakdown_limit} earlier periods omitted")
+                rows = rows[-self.breakdown_limit:]
+            lines.extend(self._format_activity_row(row, key_prefix) for row in rows)
+
+        if "directories" in self.activity_breakdowns and summary.directories:
+            lines.append("- Most changed directories:")
+            rows = summary.directories[: self.breakdown_limit]
+            lines.extend(self._format_activity_row(row) for row in rows)
+            if len(summary.directories) > len(rows):
+                lines.append(
+                    f"  - ... and {len(summary.directories) - len(rows)} more directories"
+                )
+        return lines
+
+    @staticmethod
+    def _format_activity_row(row: ActivityStats, key_prefix: str = "") -> str:
+        return (
+            f"  - {key_prefix}{row.key}: {row.commits} commits, "
+            f"+{row.insertions}/-{row.deletions} lines, {row.files} files"
+        )
+
+    def _allocate_diff_lines(self, token_budget: int) -> Dict[str, int]:
+        """Decide how many diff lines of each commit fit into the token budget.
+
+        The tokens left after the diff-less prompt are shared between commits in proportion to their churn.
+        Commits whose whole diff is cheap relative to their churn are visited first and take only what they
+        need, so the rest of their share is passed on. Commits whose share does not fit even a few diff
+        lines fall back to the commit message only. Each limit is costed on the diff exactly as it will be
+        written, since a condensed diff changes with its limit.
+        """
+        fixed_sections = list(self._iter_sections(should_include_diff=False))
+        # One token per separator between sections
+        fixed_tokens = len(fixed_sections) + sum(
+            section.tokens for section in fixed_sections
+        )
+
+        # Repeated diffs refer to the first one, so only that one takes a share
+        repeated = self._find_repeated_diffs()
+        reference_tokens = sum(
+            self.count_approximate_tokens_batch(
+                ["\n" + reference for reference in repeated.values()]
+            )
+        )
+        remaining_tokens = token_budget - fixed_tokens - reference_tokens
+
+        commits = [
+            commit
+            for project in self.project_data
+            for commit in project["recent_commits"]
+            if commit.diff and commit.id not in repeated
         ]
+        full_tokens = {}
+        for start in range(0, len(commits), COMMIT_BATCH_SIZE):
+            batch = commits[start : start + COMMIT_BATCH_SIZE]
+            counts = self.count_approximate_tokens_batch(
+                [self._format_budgeted_diff(commit, self.max_diff_lines) for commit in batch]
+            )
+            full_tokens.update(zip((commit.id for commit in batch), counts))
+        commits.sort(key=lambda commit: full_tokens[commit.id] / self._diff_weight(commit))
+        remaining_weight = sum(self._diff_weight(commit) for commit in commits)
+
+        diff_line_limits = {commit_id: 0 for commit_id in repeated}
+        for commit in commits:
+            weight = self._diff_weight(commit)
+            share = remaining_tokens * weight / remaining_weight if remaining_tokens > 0 else 0
+            remaining_weight -= weight
+
+            line_limit, used_tokens = self._fit_diff_lines(commit, share, full_tokens[commit.id])
+            diff_line_limits[commit.id] = line_limit
+            remaining_tokens -= used_tokens
+        return diff_line_limits
+
+    def _fit_diff_lines(
+            self, commit: CommitRecord, share: float, full_tokens: int
+    ) -> Tuple[int, int]:
+        """Return the most diff lines whose formatted diff fits into `share` tokens, and its tokens.
+
+        The tokens grow with the limit, so the limit is found by bisection. A limit below
+        MIN_BUDGETED_DIFF_LINES (or the whole diff, if shorter) is 0, which costs nothing.
+        """
+        if full_tokens <= share:
+            return self.max_diff_lines, full_tokens
+        low = min(MIN_BUDGETED_DIFF_LINES, self.max_diff_lines)
+        low_tokens = self.count_approximate_tokens(self._format_budgeted_diff(commit, low))
+        if low_tokens > share:
+            return 0, 0
+        # `low` fits and `high` does not
+        high = self.max_diff_lines
+        while high - low > 1:
+            middle = (low + high) // 2
+            tokens = self.count_approximate_tokens(self._format_budgeted_diff(commit, middle))
+            if tokens <= share:
+                low, low_tokens = middle, tokens
+            else:
+                high = middle
+        return low, low_tokens
+
+    def _format_budgeted_diff(self, commit: CommitRecord, max_diff_lines: int) -> str:
+        """Return the text the diff adds to the commit's section with this limit."""
+        diff_text = self._format_diff(commit, max_diff_lines)
+        return "\n" + diff_text if diff_text else ""
+
+    @staticmethod
+    def _diff_weight(commit: CommitRecord) -> int:
+        return max(1, commit.stats.insertions + commit.stats.deletions)
+
+    def generate_prompt(self, should_include_diff=True, token_budget: Optional[int] = None) -> str:
+        """Generate the prompt, fitting the diffs into `token_budget` tokens if given."""
+        return "".join(self.iter_prompt(should_include_diff, token_budget))
+
+    def iter_prompt(
+            self, should_include_diff=True, token_budget: Optional[int] = None
+    ) -> Iterator[str]:
+        """Yield the prompt in chunks, one section or commit at a time.
+
+        The token counts are complete once the iterator is exhausted.
+        """
+        diff_line_limits = None
+        if should_include_diff and token_budget is not None:
+            with profiler.stage("allocate token budget"):
+                diff_line_limits = self._allocate_diff_lines(token_budget)
+
+        self.total_tokens = 0
+        self.section_token_counts = {}
+        self.project_token_counts = {}
+        self.deduplicated_diffs = 0
+        self.deduplicated_tokens = 0
+        self._used_cache_keys = set()
+        is_first = True
+        for section in self._iter_sections(should_include_diff, diff_line_limits):
+            if section.deduplicated_tokens is not None:
+                self.deduplicated_diffs += 1
+                self.deduplicated_tokens += section.deduplicated_tokens
+            self.section_token_counts[section.name] = (
+                self.section_token_counts.get(section.name, 0) + section.tokens
+            )
+            if section.repo_path is not None:
+                self.project_token_counts[section.repo_path] = (
+                    self.project_token_counts.get(section.repo_path, 0) + section.tokens
+                )
+            self.total_tokens += section.tokens
+            if is_first:
+                is_first = False
+                yield section.text
+            else:
+                # One token per separator
+                self.total_tokens += 1
+                yield section.separator + section.text
+
+        if self.section_cache is not None and self._used_cache_keys:
+            # Drop the sections of commits no longer in the prompt
+            for key in set(self.section_cache) - self._used_cache_keys:
+                del self.section_cache[key]
+
+    def _make_section(
+            self,
+            name: str,
+            text: str,
+            repo_path: Optional[str] = None,
+            separator: str = "\n\n",
+            deduplicated_tokens: Optional[int] = None,
+    ) -> PromptSection:
+        return PromptSection(
+            name,
+            text,
+            self.count_approximate_tokens(text),
+            repo_path,
+            separator,
+            deduplicated_tokens,
+        )
+
+    def _iter_sections(
+            self, should_include_diff=True, diff_line_limits: Optional[Dict[str, int]] = None
+    ) -> Iterator[PromptSection]:
+        """Build the sections of the prompt lazily, in order, counting the tokens of each.
+
+        A diff already shown for another commit with the same patch ID, such as a cherry-pick or
+        the same change in another repository, is replaced by a reference to that commit.
+        """
+        yield self._make_section(
+            "header",
+            "# Weekly Work Report Request\n\n"
+            "Hello! Please draft a weekly work report based on the provided Git activity and previous report (if available).",
+        )
 
         # --- Template and Previous Report Section ---
         if self.template:
@@ -89,7 +372,7 @@ class PromptGenerator:
                 self.template.strip(),
                 "```",
             ]
-            prompt_sections.append("\n".join(template_section))
+            yield self._make_section("template", "\n".join(template_section))
         if self.previous_reports:
             previous_reports_section = [
                 "## 📜 Previous Weekly Reports",
@@ -97,7 +380,7 @@ class PromptGenerator:
             ]
             for report in self.previous_reports:
                 previous_reports_section.append(f"- {report}")
-            prompt_sections.append("\n".join(previous_reports_section))
+            yield self._make_section("previous_reports", "\n".join(previous_reports_section))
 
         if self.memo:
             memo_section = [
@@ -106,45 +389,16 @@ class PromptGenerator:
                 "",
                 f"{self.memo}",
             ]
-            prompt_sections.append("\n".join(memo_section))
+            yield self._make_section("memo", "\n".join(memo_section))
+
+        # Patch ID -> commit, project and line limit of the first diff shown
+        shown_diffs: Dict[str, Tuple[CommitRecord, str, Optional[int]]] = {}
 
         # --- Per Project Section ---
         for project in self.project_data:
-            project_name = project["project_name"]
-            summary = project["summary"]
-            recent_commits = project["recent_commits"]
-
-            # Summary
-            summary_title = f"## 📊 [{project_name}] This Week's Git Activity Summary"
-            summary_content = []
-            if summary:
-                summary_content.append(
-                    f"{summary_title} ({summary.start_date.strftime('%Y-%m-%d')} ~ {summary.end_date.strftime('%Y-%m-%d')})"
-                )
-                summary_content.append(f"- Total commits: {summary.total_commits}")
-                summary_content.append(
-                    f"- Total lines added: {summary.total_insertions}"
-                )
-                summary_content.append(f"- Total lines deleted: {summary.total_deletions}")
-                summary_content.append(
-                    f"- Number of files changed: {summary.total_files_changed}"
-                )
-            else:
-                summary_content.append(summary_title)
-                summary_content.append(
-                    "- No Git activity summary information for this period."
-                )
-            prompt_sections.append("\n".join(summary_content))
-
-            # Commit Details
-            commit_details_header = (
-                f"## 🚀 [{project_name}] Main Progress This Week (Based on Git Commits)"
+            yield from self._iter_cached_project_sections(
+                project, should_include_diff, diff_line_limits, shown_diffs
             )
-            commit_details_parts = [
-                commit_details_header,
-                self._format_commits(recent_commits, should_include_diff),
-            ]
-            prompt_sections.append("\n".join(commit_details_parts))
 
         # --- Report Writing Instructions ---
         instructions = [
@@ -158,11 +412,196 @@ class PromptGenerator:
             "- Match the tone and sentence endings to the previous weekly reports provided. If previous reports use concise, note-style bullet points (not full sentences), follow the same style.",
             "- Keep each item brief and in a similar format to the previous reports, using phrases or keywords rather than complete sentences if that is the established style.",
         ]
-        prompt_sections.append("\n".join(instructions))
+        yield self._make_section("instructions", "\n".join(instructions))
+
+    def _iter_cached_project_sections(
+            self,
+            project: Dict[str, Any],
+            should_include_diff: bool,
+            diff_line_limits: Optional[Dict[str, int]],
+            shown_diffs: Dict[str, Tuple[CommitRecord, str, Optional[int]]],
+    ) -> Iterator[PromptSection]:
+        """Yield the project's sections, reusing those built for the same commits by an earlier prompt.
+
+        Sections are only cached without a token budget, since the budget shares the diff lines
+        out across all projects.
+        """
+        if self.section_cache is None or not should_include_diff or diff_line_limits is not None:
+            yield from self._iter_project_sections(
+                project, should_include_diff, diff_line_limits, shown_diffs
+            )
+            return
+
+        key = self._get_section_cache_key(project, shown_diffs)
+        self._used_cache_keys.add(key)
+        cached = self.section_cache.get(key)
+        if cached is not None:
+            profiler.count("project sections reused")
+            sections, project_shown_diffs = cached
+            yield from sections
+            shown_diffs.update(project_shown_diffs)
+            return
 
-        return "\n\n".join(prompt_sections)
+        shown_before = set(shown_diffs)
+        sections = []
+        for section in self._iter_project_sections(
+            project, should_include_diff, diff_line_limits, shown_diffs
+        ):
+            sections.append(section)
+            yield section
+        self.section_cache[key] = (
+            sections,
+            {
+                patch_id: shown
+                for patch_id, shown in shown_diffs.items()
+                if patch_id not in shown_before
+            },
+        )
 
-    def count_approximate_tokens(self, text: str, model: str = "gpt-4") -> int:
+    @staticmethod
+    def _get_section_cache_key(
+            project: Dict[str, Any], shown_diffs: Dict[str, Tuple[CommitRecord, str, Optional[int]]]
+    ) -> Tuple:
+        """Identify the input of a project's sections: its commits and the earlier diffs they refer to."""
+        commits = project["recent_commits"]
+        references = tuple(
+            (commit.patch_id, shown_diffs[commit.patch_id][0].id, shown_diffs[commit.patch_id][1])
+            for commit in commits
+            if commit.patch_id in shown_diffs
+        )
+        return (
+            project["repo_path"],
+            project.get("head_commit"),
+            tuple(commit.id for commit in commits),
+            references,
+        )
+
+    def _iter_project_sections(
+            self,
+            project: Dict[str, Any],
+            should_include_diff: bool,
+            diff_line_limits: Optional[Dict[str, int]],
+            shown_diffs: Dict[str, Tuple[CommitRecord, str, Optional[int]]],
+    ) -> Iterator[PromptSection]:
+        """Build the summary and commit sections of one project."""
+        project_name = project["project_name"]
+        repo_path = project["repo_path"]
+        summary = project["summary"]
+        recent_commits = project["recent_commits"]
+
+        # Summary
+        summary_title = f"## 📊 [{project_name}] This Week's Git Activity Summary"
+        summary_content = []
+        if summary:
+            summary_content.append(
+                f"{summary_title} ({summary.start_date.strftime('%Y-%m-%d')} ~ {summary.end_date.strftime('%Y-%m-%d')})"
+            )
+            summary_content.append(f"- Total commits: {summary.total_commits}")
+            summary_content.append(
+                f"- Total lines added: {summary.total_insertions}"
+            )
+            summary_content.append(f"- Total lines deleted: {summary.total_deletions}")
+            summary_content.append(
+                f"- Number of files changed: {summary.total_files_changed}"
+            )
+            summary_content.extend(self._format_activity(summary))
+        else:
+            summary_content.append(summary_title)
+            summary_content.append(
+                "- No Git activity summary information for this period."
+            )
+        yield self._make_section(
+            f"{project_name} summary", "\n".join(summary_content), repo_path
+        )
+
+        # Commit Details
+        commit_details_header = (
+            f"## 🚀 [{project_name}] Main Progress This Week (Based on Git Commits)"
+        )
+        yield self._make_section(
+            f"{project_name} commits", commit_details_header, repo_path
+        )
+        # Each commit is its own chunk
+        if not recent_commits:
+            yield self._make_section(
+                f"{project_name} commits", "  - None", repo_path, separator="\n"
+            )
+        for start in range(0, len(recent_commits), COMMIT_BATCH_SIZE):
+            yield from self._iter_commit_sections(
+                recent_commits[start : start + COMMIT_BATCH_SIZE],
+                project_name,
+                repo_path,
+                should_include_diff,
+                diff_line_limits,
+                shown_diffs,
+            )
+
+    def _iter_commit_sections(
+            self,
+            commits: List[CommitRecord],
+            project_name: str,
+            repo_path: str,
+            should_include_diff: bool,
+            diff_line_limits: Optional[Dict[str, int]],
+            shown_diffs: Dict[str, Tuple[CommitRecord, str, Optional[int]]],
+    ) -> Iterator[PromptSection]:
+        """Format a batch of commits in order, then count the tokens of all of them at once."""
+        commit_texts = []
+        # Commit index -> diff shown earlier and the reference replacing it, to count the tokens saved
+        replaced_diffs: Dict[int, Tuple[str, str]] = {}
+        with profiler.stage("format commit"):
+            for commit in commits:
+                max_diff_lines = (diff_line_limits or {}).get(commit.id)
+                commit_text = self._format_commit_message(commit)
+                shown = (
+                    shown_diffs.get(commit.patch_id)
+                    if should_include_diff and self.diff_deduplication and commit.patch_id
+                    else None
+                )
+                if shown is not None:
+                    shown_commit, shown_project_name, shown_max_diff_lines = shown
+                    reference = self._format_diff_reference(shown_commit, shown_project_name)
+                    commit_text += "\n" + reference
+                    replaced_diffs[len(commit_texts)] = (
+                        self._format_diff(shown_commit, shown_max_diff_lines),
+                        reference,
+                    )
+                elif should_include_diff:
+                    diff_text = self._format_diff(commit, max_diff_lines)
+                    if diff_text:
+                        commit_text += "\n" + diff_text
+                        if commit.patch_id:
+                            shown_diffs[commit.patch_id] = (
+                                commit, project_name, max_diff_lines
+                            )
+                commit_texts.append(commit_text)
+
+        token_counts = self.count_approximate_tokens_batch(
+            commit_texts + [text for pair in replaced_diffs.values() for text in pair]
+        )
+        deduplicated_tokens: Dict[int, int] = {}
+        replaced_counts = iter(token_counts[len(commit_texts) :])
+        for index in replaced_diffs:
+            diff_tokens = next(replaced_counts)
+            reference_tokens = next(replaced_counts)
+            deduplicated_tokens[index] = max(0, diff_tokens - reference_tokens)
+
+        for index, commit_text in enumerate(commit_texts):
+            yield PromptSection(
+                f"{project_name} commits",
+                commit_text,
+                token_counts[index],
+                repo_path,
+                separator="\n",
+                deduplicated_tokens=deduplicated_tokens.get(index),
+            )
+
+    def count_approximate_tokens(self, text: str, model: str = DEFAULT_MODEL) -> int:
         """Calculate the approximate number of tokens in the given string."""
-        encoding = tiktoken.encoding_for_model(model)
-        return len(encoding.encode(text))
+        return count_tokens(text, model)
+
+    def count_approximate_tokens_batch(
+            self, texts: List[str], model: str = DEFAULT_MODEL
+    ) -> List[int]:
+        """Calculate the approximate number of tokens in each string, encoding them on several threads."""
+        return count_tokens_batch(texts, model, self.tokenizer_threads)
@@ -1,16 +1,30 @@
+import codecs
 import os
 import re
+import tempfile
 from datetime import datetime
-from pathlib import Path
+from typing import BinaryIO, List, Optional, Tuple
 
 from config_loader import ConfigLoader
-from const import REPORT_BLANK_MESSAGE, MEMO_BLANK_MESSAGE
+from const import DEFAULT_BUILD_DIR, REPORT_BLANK_MESSAGE, MEMO_BLANK_MESSAGE
+from file_modes import set_default_mode
+from history_index import HistoryIndex, REPORT_FILENAME_PATTERN
+from profiler import profiler
+from token_counter import truncate_to_tokens
+
+# Markdown headings of the cut-off part listed in the note on a truncated report or memo
+MAX_OMITTED_HEADINGS = 10
+# Longest piece of a line read at once while looking for headings in the cut-off part
+HEADING_SCAN_CHUNK_BYTES = 64 * 1024
+# The cut-off part is only scanned this far for headings, so a huge file is never read to the end
+MAX_HEADING_SCAN_BYTES = 1024 * 1024
+HEADING_PATTERN = re.compile(r"#{1,6}\s+(.+?)\s*#*\s*$")
 
 
 class ReportFileManager:
     def __init__(self, config_loader: ConfigLoader, build_dir=None):
         if build_dir is None:
-            build_dir = os.path.join(Path(__file__).parent.parent, "build")
+            build_dir = DEFAULT_BUILD_DIR
             if not os.path.isdir(build_dir):
                 # Create the default build directory if it does not exist
                 os.makedirs(build_dir, exist_ok=True)
@@ -19,18 +33,42 @@ class ReportFileManager:
         self.build_dir = build_dir
         self.history_dir = os.path.join(self.build_dir, "history")
         os.makedirs(self.history_dir, exist_ok=True)
+        self.history_index = HistoryIndex(self.history_dir)
 
         self.history_limit = config_loader.get_report_history_limit()
+        self.max_report_tokens = config_loader.get_max_report_tokens()
+        self.max_report_bytes = _kb_to_bytes(config_loader.get_max_report_size_kb())
+        self.max_memo_tokens = config_loader.get_max_memo_tokens()
+        self.max_memo_bytes = _kb_to_bytes(config_loader.get_max_memo_size_kb())
         self.prompt_file_path = None
 
     def get_today_str(self):
         return datetime.now().strftime("%Y%m%d-%H%M%S")
 
     def save_prompt(self, prompt_text):
+        """Write the prompt, given as a string or an iterable of chunks, atomically."""
         filename = f"prompt-{self.get_today_str()}.md"
         path = os.path.join(self.build_dir, filename)
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(prompt_text)
+        if isinstance(prompt_text, str):
+            prompt_text = [prompt_text]
+        # Write to a temporary file first, so a failure never leaves a partial prompt behind
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self.build_dir, prefix=".prompt-", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                for chunk in prompt_text:
+                    with profiler.stage("write prompt"):
+                        f.write(chunk)
+                    profiler.count("prompt characters written", len(chunk))
+            set_default_mode(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        # A regenerated prompt replaces the one written before it
+        if self.prompt_file_path not in (None, path) and os.path.exists(self.prompt_file_path):
+            os.remove(self.prompt_file_path)
         self.prompt_file_path = path
         return path
 
@@ -42,7 +80,8 @@ class ReportFileManager:
         return path
 
     def move_previous_reports(self):
-        """Move previous reports to the history directory."""
+        """Move previous reports to the history directory and return the names of the moved files."""
+        moved_filenames = []
         for filename in os.listdir(self.build_dir):
             if filename.startswith("report-") and filename.endswith(".md"):
                 file_path = os.path.join(self.build_dir, filename)
@@ -53,31 +92,34 @@ class ReportFileManager:
                     # Move to history directory
                     dest_path = os.path.join(self.history_dir, filename)
                     os.rename(file_path, dest_path)
+                    self.history_index.add(filename, content.encode("utf-8"))
+                    moved_filenames.append(filename)
                 else:
                     # If the report is blank, delete it
                     os.remove(file_path)
+        return moved_filenames
 
     def fetch_report_history(self):
-        """Return a list of previous reports."""
+        """Return a list of previous reports, newest first, each cut to the configured size and token caps."""
         reports = []
-        for filename in os.listdir(self.history_dir):
-            if filename.startswith("report-") and filename.endswith(".md"):
-                with open(
-                        os.path.join(self.history_dir, filename), "r", encoding="utf-8"
-                ) as f:
-                    content = f.read()
-                reports.append(content)
-        return sorted(reports, reverse=True)[: self.history_limit]
+        # Only the newest reports are opened
+        for entry in self.history_index.latest(self.history_limit):
+            reports.append(
+                read_bounded_text(
+                    os.path.join(self.history_dir, entry.filename),
+                    self.max_report_bytes,
+                    self.max_report_tokens,
+                )
+            )
+        return reports
 
     def get_last_report_date(self):
         """Return the date of the last report."""
-        dates = []
-        for filename in os.listdir(self.history_dir):
-            match = re.match(r"report-(\d{8}-\d{6})\.md", filename)
-            if match:
-                date_str = match.group(1)
-                date = datetime.strptime(date_str, "%Y%m%d-%H%M%S")
-                dates.append(date)
+        dates = [
+            entry.date
+            for entry in self.history_index.latest()
+            if REPORT_FILENAME_PATTERN.fullmatch(entry.filename)
+        ]
         return max(dates) if dates else None
 
     def clear_previous_prompts(self):
@@ -90,10 +132,96 @@ class ReportFileManager:
     def fetch_memo(self):
         memo_path = os.path.join(self.build_dir, "memo.md")
         if not os.path.exists(memo_path):
-            with open(memo_path) as f:
+            with open(memo_path, "w", encoding="utf-8") as f:
                 f.write(MEMO_BLANK_MESSAGE)
-        with open(os.path.join(self.build_dir, "memo.md"), "r", encoding="utf-8") as f:
-            memo = f.read().strip()
+        memo = read_bounded_text(memo_path, self.max_memo_bytes, self.max_memo_tokens).strip()
         if memo == MEMO_BLANK_MESSAGE.strip():
             return None
         return memo
+
+
+def read_bounded_text(
+    path: str, max_bytes: Optional[int] = None, max_tokens: Optional[int] = None
+) -> str:
+    """Read a UTF-8 text file, keeping at most `max_bytes` bytes and `max_tokens` tokens of it.
+
+    Only the kept part is read into memory. If the file is cut, a note with the size of the cut-off
+    part and the Markdown headings found in its first MAX_HEADING_SCAN_BYTES, scanned a line at a
+    time, takes its place.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        data = f.read() if max_bytes is None else f.read(max_bytes)
+        profiler.count("report bytes read", len(data))
+        # A character cut in half at the end is left out
+        text = codecs.getincrementaldecoder("utf-8")(errors="replace").decode(data)
+        # Every token is at least one byte, so shorter texts are not encoded; a short memo or report
+        # then does not load the tokenizer ahead of its background preload
+        if max_tokens is not None and len(data) > max_tokens:
+            text = truncate_to_tokens(text, max_tokens) or text
+        kept_bytes = len(text.encode("utf-8"))
+        if kept_bytes >= size:
+            return text
+
+        # End on a whole line, unless that would throw away most of what was kept
+        line_end = text.rfind("\n")
+        if line_end > len(text) // 2:
+            text = text[:line_end]
+            kept_bytes = len(text.encode("utf-8"))
+        f.seek(kept_bytes)
+        headings, heading_count, scanned_bytes = _scan_headings(f)
+        profiler.count("report bytes read", scanned_bytes)
+    note = _format_truncation_note(
+        kept_bytes, size, headings, heading_count, kept_bytes + scanned_bytes < size
+    )
+    return f"{text.rstrip()}\n\n{note}"
+
+
+def _scan_headings(f: BinaryIO) -> Tuple[List[str], int, int]:
+    """Return the first Markdown headings from the current position on, how many were found, and the bytes read.
+
+    Scanning stops after MAX_HEADING_SCAN_BYTES.
+    """
+    headings = []
+    heading_count = 0
+    scanned_bytes = 0
+    # The first line may have been cut in the middle
+    at_line_start = False
+    while scanned_bytes < MAX_HEADING_SCAN_BYTES:
+        chunk = f.readline(min(HEADING_SCAN_CHUNK_BYTES, MAX_HEADING_SCAN_BYTES - scanned_bytes))
+        if not chunk:
+            break
+        scanned_bytes += len(chunk)
+        if at_line_start and chunk.startswith(b"#"):
+            match = HEADING_PATTERN.fullmatch(chunk.decode("utf-8", errors="replace").strip())
+            if match:
+                heading_count += 1
+                if len(headings) < MAX_OMITTED_HEADINGS:
+                    headings.append(match.group(1))
+        at_line_start = chunk.endswith(b"\n")
+    return headings, heading_count, scanned_bytes
+
+
+def _format_truncation_note(
+    kept_bytes: int, size: int, headings: List[str], heading_count: int, partial_scan: bool = False
+) -> str:
+    note = f"[... Truncated: showing the first {_format_size(kept_bytes)} of {_format_size(size)}"
+    if headings:
+        note += f". Sections not shown: {', '.join(headings)}"
+        if heading_count > len(headings):
+            note += f" and {'at least ' if partial_scan else ''}{heading_count - len(headings)} more"
+        elif partial_scan:
+            note += " and possibly more"
+    return note + "]"
+
+
+def _format_size(size: int) -> str:
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+def _kb_to_bytes(size_kb: Optional[float]) -> Optional[int]:
+    return None if size_kb is None else int(size_kb * 1024)
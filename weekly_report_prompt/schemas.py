@@ -1,4 +1,7 @@
+from dataclasses import dataclass, field
 from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
 from pydantic import BaseModel
 
 
@@ -6,6 +9,8 @@ class CommitStats(BaseModel):
     insertions: int
     deletions: int
     files: int
+    # (path, insertions, deletions) of each changed file
+    per_file: List[Tuple[str, int, int]] = []
 
 
 class CommitData(BaseModel):
@@ -16,23 +21,19 @@ class CommitData(BaseModel):
     message: str
     stats: CommitStats
     diff: str
+    # Number of lines in the complete diff, of which `diff` may hold only the first few
+    diff_total_lines: int = 0
+    # Stable patch ID of the complete diff, shared by commits making the same change
+    patch_id: str = ""
 
-    @classmethod
-    def from_commit(cls, commit, diff):
-        """Create a CommitData instance from a commit object."""
-        return cls(
-            id=commit.hexsha,
-            author=commit.author.name,
-            email=commit.author.email,
-            date=commit.committed_datetime.isoformat(),
-            message=commit.message.strip(),
-            stats=CommitStats(
-                insertions=commit.stats.total["insertions"],
-                deletions=commit.stats.total["deletions"],
-                files=commit.stats.total["files"],
-            ),
-            diff=diff,
-        )
+
+class ActivityStats(BaseModel):
+    # A day or the Monday of a week (ISO date), or a directory
+    key: str
+    commits: int
+    insertions: int
+    deletions: int
+    files: int
 
 
 class CommitDataSummary(BaseModel):
@@ -43,3 +44,152 @@ class CommitDataSummary(BaseModel):
     total_insertions: int
     total_deletions: int
     total_files_changed: int
+
+    # Oldest first
+    daily: List[ActivityStats] = []
+    weekly: List[ActivityStats] = []
+    # Most changed first
+    directories: List[ActivityStats] = []
+
+
+class HistoryEntry(BaseModel):
+    filename: str
+    date: datetime
+    size: int
+    mtime: float
+    sha256: str
+
+
+@dataclass(slots=True)
+class StatsRecord:
+    """Lightweight counterpart of CommitStats."""
+
+    insertions: int
+    deletions: int
+    files: int
+    per_file: List[Tuple[str, int, int]] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class CommitRecord:
+    """Lightweight counterpart of CommitData, used while collecting and formatting commits.
+
+    Nothing is validated or copied, which matters for thousands of commits with large diffs.
+    Convert to CommitData where commits leave the program.
+    """
+
+    id: str
+    author: str
+    email: str
+    date: datetime
+    message: str
+    stats: StatsRecord
+    diff: str
+    diff_total_lines: int = 0
+    patch_id: str = ""
+
+    @classmethod
+    def from_commit(cls, commit, diff, diff_total_lines=0, stats=None, patch_id="", author=None):
+        """Create a CommitRecord from a GitPython commit object.
+
+        `author` is a (name, email) pair replacing the commit's own, e.g. mapped through .mailmap.
+        """
+        if stats is None:
+            total = commit.stats.total
+            stats = StatsRecord(
+                total["insertions"],
+                total["deletions"],
+                total["files"],
+                [
+                    (path, file_stats["insertions"], file_stats["deletions"])
+                    for path, file_stats in commit.stats.files.items()
+                ],
+            )
+        if author is None:
+            author = (commit.author.name, commit.author.email)
+        return cls(
+            id=commit.hexsha,
+            author=author[0],
+            email=author[1],
+            date=commit.committed_datetime,
+            message=commit.message.strip(),
+            stats=stats,
+            diff=diff,
+            diff_total_lines=diff_total_lines,
+            patch_id=patch_id,
+        )
+
+    @classmethod
+    def from_commit_data(cls, commit_data: CommitData) -> "CommitRecord":
+        stats = commit_data.stats
+        return cls(
+            id=commit_data.id,
+            author=commit_data.author,
+            email=commit_data.email,
+            date=commit_data.date,
+            message=commit_data.message,
+            stats=StatsRecord(
+                stats.insertions, stats.deletions, stats.files, list(stats.per_file)
+            ),
+            diff=commit_data.diff,
+            diff_total_lines=commit_data.diff_total_lines,
+            patch_id=commit_data.patch_id,
+        )
+
+    def to_commit_data(self) -> CommitData:
+        return CommitData(
+            id=self.id,
+            author=self.author,
+            email=self.email,
+            date=self.date,
+            message=self.message,
+            stats=CommitStats(
+                insertions=self.stats.insertions,
+                deletions=self.stats.deletions,
+                files=self.stats.files,
+                per_file=self.stats.per_file,
+            ),
+            diff=self.diff,
+            diff_total_lines=self.diff_total_lines,
+            patch_id=self.patch_id,
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CommitRecord":
+        """Create a CommitRecord from the JSON form of CommitData."""
+        stats = data["stats"]
+        return cls(
+            id=data["id"],
+            author=data["author"],
+            email=data["email"],
+            date=datetime.fromisoformat(data["date"]),
+            message=data["message"],
+            stats=StatsRecord(
+                stats["insertions"],
+                stats["deletions"],
+                stats["files"],
+                [tuple(file_stats) for file_stats in stats.get("per_file", [])],
+            ),
+            diff=data["diff"],
+            diff_total_lines=data.get("diff_total_lines", 0),
+            patch_id=data.get("patch_id", ""),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the JSON form of CommitData, without validating it."""
+        return {
+            "id": self.id,
+            "author": self.author,
+            "email": self.email,
+            "date": self.date.isoformat(),
+            "message": self.message,
+            "stats": {
+                "insertions": self.stats.insertions,
+                "deletions": self.stats.deletions,
+                "files": self.stats.files,
+                "per_file": self.stats.per_file,
+            },
+            "diff": self.diff,
+            "diff_total_lines": self.diff_total_lines,
+            "patch_id": self.patch_id,
+        }
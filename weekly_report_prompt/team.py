@@ -0,0 +1,179 @@
+import os
+import re
+from datetime import datetime
+from typing import TYPE_CHECKING, List, Optional, Set
+
+from authors import build_author_patterns
+from collection_state import CollectionState
+from config_loader import ConfigLoader
+from report_file_manager import DEFAULT_BUILD_DIR, ReportFileManager
+from schemas import CommitRecord
+
+if TYPE_CHECKING:
+    # GitPython is only loaded once repositories are collected
+    from git_data_collector import GitDataCollector
+
+
+class TeamMember:
+    """An author who gets their own prompt, report and history from a shared collection pass.
+
+    Without a `team` in the configuration, the configured author is the only member and uses the
+    default build directory.
+    """
+
+    def __init__(
+        self,
+        name: Optional[str],
+        author_patterns: List[str],
+        file_mgr: ReportFileManager,
+        collection_state: Optional[CollectionState] = None,
+    ):
+        self.name = name
+        self.author_patterns = author_patterns
+        # The extended regexes given to `git log --author` are also valid Python regexes
+        self._author_regexes = [re.compile(pattern) for pattern in author_patterns]
+        self.file_mgr = file_mgr
+        self.collection_state = collection_state
+
+        # Filled in by main() once the previous reports have been processed
+        self.since_date: Optional[datetime] = None
+        self.previous_reports: List[str] = []
+        self.memo: Optional[str] = None
+        # Kept across the prompts regenerated by --watch
+        self.report_file_path: Optional[str] = None
+
+    def matches(self, commit: CommitRecord) -> bool:
+        """Return whether the commit was written by this member, matching "Name <email>" like git does."""
+        ident = f"{commit.author} <{commit.email}>"
+        return any(regex.search(ident) for regex in self._author_regexes)
+
+    def get_last_tip(self, repo_path: str) -> Optional[str]:
+        if self.collection_state is None:
+            return None
+        return self.collection_state.get_last_tip(repo_path)
+
+    def get_reported_commits(self, repo_path: str) -> Set[str]:
+        if self.collection_state is None:
+            return set()
+        return self.collection_state.get_reported_commits(repo_path)
+
+
+def load_team_members(config: ConfigLoader) -> List[TeamMember]:
+    """Create the members of the configured team, or the single configured author."""
+    team = config.get_team()
+    if not team:
+        file_mgr = ReportFileManager(config_loader=config)
+        return [
+            _make_member(
+                config,
+                None,
+                _get_member_patterns(None, config.get_authors(), config.get_author_patterns()),
+                file_mgr,
+            )
+        ]
+
+    members = []
+    for member in team:
+        # Relative build directories are resolved against the default one
+        build_dir = os.path.join(DEFAULT_BUILD_DIR, member["build_dir"] or member["name"])
+        os.makedirs(build_dir, exist_ok=True)
+        file_mgr = ReportFileManager(config_loader=config, build_dir=build_dir)
+        members.append(
+            _make_member(
+                config,
+                member["name"],
+                _get_member_patterns(
+                    member["name"], member["authors"], member["author_patterns"]
+                ),
+                file_mgr,
+            )
+        )
+    return members
+
+
+def _get_member_patterns(name: Optional[str], authors: List[str], author_patterns: List[str]) -> List[str]:
+    """Return the member's `git log --author` patterns; a member without any would collect every author."""
+    patterns = build_author_patterns(authors, author_patterns)
+    if not patterns:
+        if name is None:
+            raise ValueError("No author configured: set `author` or `author_patterns`")
+        raise ValueError(f"No author configured for team member '{name}': set `author` or `author_patterns`")
+    return patterns
+
+
+def _make_member(config, name, author_patterns, file_mgr) -> TeamMember:
+    collection_state = None
+    if config.get_incremental_collection():
+        collection_state = CollectionState(os.path.join(file_mgr.build_dir, "state.json"))
+    return TeamMember(name, author_patterns, file_mgr, collection_state)
+
+
+def combine_author_patterns(members: List[TeamMember]) -> List[str]:
+    """Return patterns selecting the commits of any member."""
+    # Deduplicated, keeping the order
+    return list(
+        dict.fromkeys(pattern for member in members for pattern in member.author_patterns)
+    )
+
+
+def get_shared_watermark(
+    members: List[TeamMember], repo_path: str, collector: "GitDataCollector"
+) -> Optional[str]:
+    """Return a commit whose range to the tip covers every member's watermark range.
+
+    This is the members' common watermark, or the merge base of their watermarks if they differ.
+    If any member has no watermark, None is returned and the repository is scanned by date.
+    """
+    tips = [member.get_last_tip(repo_path) for member in members]
+    if any(tip is None for tip in tips):
+        return None
+    unique_tips = list(dict.fromkeys(tips))
+    if len(unique_tips) == 1:
+        return unique_tips[0]
+    return collector.get_merge_base(unique_tips)
+
+
+def partition_commits(
+    members: List[TeamMember],
+    repo_path: str,
+    collector: "GitDataCollector",
+    commits: List[CommitRecord],
+    since_date: datetime,
+    since_commit: Optional[str],
+    until_commit: str,
+) -> List[List[CommitRecord]]:
+    """Split the commits collected for all members into each member's commits, in the members' order.
+
+    The shared collection window is the union of the members' windows, so each member's own watermark
+    or report date and already reported commits are applied here.
+    """
+    collected_since_commit = since_commit is not None and collector.has_commit(since_commit)
+    member_commits = []
+    for member in members:
+        selected = [commit for commit in commits if member.matches(commit)]
+
+        tip = member.get_last_tip(repo_path)
+        if tip is not None and collector.has_commit(tip):
+            if not (collected_since_commit and tip == since_commit):
+                range_ids = collector.list_range_commit_ids(tip, until_commit)
+                selected = [commit for commit in selected if commit.id in range_ids]
+        elif member.since_date > since_date:
+            # `git log --since` compares committer dates in local time
+            selected = [
+                commit
+                for commit in selected
+                if commit.date.astimezone().replace(tzinfo=None) >= member.since_date
+            ]
+
+        reported_commits = member.get_reported_commits(repo_path)
+        if reported_commits:
+            selected = [commit for commit in selected if commit.id not in reported_commits]
+        member_commits.append(selected)
+    return member_commits
+
+
+def get_common_reported_commits(members: List[TeamMember], repo_path: str) -> Set[str]:
+    """Return the commits every member has already reported, which no member needs collected again."""
+    return set.intersection(
+        *(member.get_reported_commits(repo_path) for member in members)
+    )
@@ -0,0 +1,85 @@
+import os
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from const import DEFAULT_BUILD_DIR
+from profiler import profiler
+
+if TYPE_CHECKING:
+    import tiktoken
+
+DEFAULT_MODEL = "gpt-4"
+# Same as tiktoken's own default for its batch encoders
+DEFAULT_TOKENIZER_THREADS = 8
+# tiktoken downloads its BPE files once and reads them from here afterwards, instead of the
+# system temporary directory, which may be cleared; TIKTOKEN_CACHE_DIR overrides it
+TIKTOKEN_CACHE_DIR = os.path.join(DEFAULT_BUILD_DIR, "cache", "tiktoken")
+
+_encodings: Dict[str, "tiktoken.Encoding"] = {}
+_encodings_lock = threading.Lock()
+
+
+def get_encoding(model: str = DEFAULT_MODEL) -> "tiktoken.Encoding":
+    """Return the tiktoken encoding for the model, loading tiktoken and its BPE data only once per process."""
+    encoding = _encodings.get(model)
+    if encoding is not None:
+        return encoding
+    # Held while loading, so a preload in progress is waited for instead of repeated
+    with _encodings_lock:
+        encoding = _encodings.get(model)
+        if encoding is None:
+            with profiler.stage("load tokenizer"):
+                os.environ.setdefault("TIKTOKEN_CACHE_DIR", TIKTOKEN_CACHE_DIR)
+                import tiktoken
+
+                encoding = _encodings[model] = tiktoken.encoding_for_model(model)
+    return encoding
+
+
+def preload_encoding(model: str = DEFAULT_MODEL) -> threading.Thread:
+    """Load the encoding in a background thread, e.g. while git is busy collecting commits."""
+    thread = threading.Thread(
+        target=get_encoding, args=(model,), name="preload-encoding", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = DEFAULT_MODEL) -> Optional[str]:
+    """Return the longest prefix of the text within `max_tokens` tokens, or None if the whole text fits."""
+    encoding = get_encoding(model)
+    with profiler.stage("count tokens"):
+        tokens = encoding.encode_ordinary(text)
+    profiler.count("tokens counted", len(tokens))
+    if len(tokens) <= max_tokens:
+        return None
+    return encoding.decode(tokens[:max_tokens])
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    """Calculate the approximate number of tokens in the given string."""
+    with profiler.stage("count tokens"):
+        # Special tokens such as <|endoftext|> appearing in a diff are counted as plain text
+        tokens = len(get_encoding(model).encode_ordinary(text))
+    profiler.count("tokens counted", tokens)
+    return tokens
+
+
+def count_tokens_batch(
+    texts: List[str], model: str = DEFAULT_MODEL, num_threads: int = DEFAULT_TOKENIZER_THREADS
+) -> List[int]:
+    """Calculate the approximate number of tokens in each string, in order.
+
+    The strings are encoded on `num_threads` threads; tiktoken releases the GIL while encoding,
+    so they run on several cores.
+    """
+    if not texts:
+        return []
+    encoding = get_encoding(model)
+    with profiler.stage("count tokens"):
+        counts = [
+            len(tokens)
+            for tokens in encoding.encode_ordinary_batch(texts, num_threads=num_threads)
+        ]
+    profiler.count("tokens counted", sum(counts))
+    return counts
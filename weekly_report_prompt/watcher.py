@@ -0,0 +1,92 @@
+import os
+from typing import Dict, List, Optional
+
+from commit_cache import CommitCache
+from config_loader import ConfigLoader
+from git_data_collector import GitDataCollector
+from mirror_cache import MirrorCache, is_remote_url
+from team import TeamMember, combine_author_patterns
+
+
+class RepositoryWatcher:
+    """Keep a collector open per repository and report which repositories and memos changed.
+
+    Polling only reads refs and file metadata: the checked-out commit of each repository, which
+    GitPython resolves from the ref files without running git, and the mtime of each member's memo.
+    Remote repositories are asked for the tip of their branch, and fetched into their mirror only
+    when it moved.
+    """
+
+    def __init__(
+        self,
+        config: ConfigLoader,
+        repo_paths: List[str],
+        members: List[TeamMember],
+        commit_cache: Optional[CommitCache] = None,
+        mirror_cache: Optional[MirrorCache] = None,
+    ):
+        self.config = config
+        self.repo_paths = repo_paths
+        self.members = members
+        self.commit_cache = commit_cache
+        self.mirror_cache = mirror_cache
+        self._author_patterns = combine_author_patterns(members)
+        self._collectors: Dict[str, GitDataCollector] = {}
+        # Repository -> commit checked out at the last poll, None if unreadable
+        self._heads: Dict[str, Optional[str]] = {}
+        # Member index -> mtime of the memo at the last poll, None if missing
+        self._memo_mtimes: Dict[int, Optional[int]] = {}
+
+    def get_collector(self, repo_path: str) -> Optional[GitDataCollector]:
+        """Return the repository's open collector, or None if it is remote or could not be opened at the last poll."""
+        return self._collectors.get(repo_path)
+
+    def _read_head(self, repo_path: str) -> Optional[str]:
+        if is_remote_url(repo_path):
+            try:
+                return MirrorCache.get_remote_head(
+                    repo_path, self.config.get_repository_setting(repo_path, "branch")
+                )
+            except Exception:
+                return None
+        try:
+            collector = self._collectors.get(repo_path)
+            if collector is None:
+                collector = self._collectors[repo_path] = GitDataCollector(
+                    config_loader=self.config,
+                    repo_path=repo_path,
+                    commit_cache=self.commit_cache,
+                    author_patterns=self._author_patterns,
+                )
+            return collector.get_head_commit()
+        except Exception:
+            # Opened again on the next poll, e.g. once the repository has been cloned
+            self._collectors.pop(repo_path, None)
+            return None
+
+    def changed_repositories(self) -> List[str]:
+        """Return the repositories whose checked-out commit moved since the last call; all of them on the first.
+
+        A repository that fails to collect is therefore retried once its commit moves again.
+        """
+        changed = []
+        for repo_path in self.repo_paths:
+            head = self._read_head(repo_path)
+            if repo_path not in self._heads or self._heads[repo_path] != head:
+                changed.append(repo_path)
+            self._heads[repo_path] = head
+        return changed
+
+    def changed_memos(self) -> List[int]:
+        """Return the indexes of the members whose memo was edited, created or deleted since the last call."""
+        changed = []
+        for member_index, member in enumerate(self.members):
+            memo_path = os.path.join(member.file_mgr.build_dir, "memo.md")
+            try:
+                mtime = os.stat(memo_path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if member_index in self._memo_mtimes and self._memo_mtimes[member_index] != mtime:
+                changed.append(member_index)
+            self._memo_mtimes[member_index] = mtime
+        return changed